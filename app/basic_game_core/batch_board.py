@@ -0,0 +1,150 @@
+from app.basic_game_core.field import GameStates
+from app.basic_game_core.geometry import Geometry
+from app.basic_game_core.player import Player
+import numpy as np
+
+
+class BatchBoard:
+    """
+    N независимых партий одной геометрии в общих массивах. Каждая операция -- один векторный вызов на все партии
+    (или на подмножество games -- массив номеров партий):
+
+    figures -- int-массив (N, HEIGHT * WIDTH): фигура в клетке, -1 -- пустая клетка
+    who_moves -- (N,): чей ход (значение Player.Type: 0 -- крестики, 1 -- нолики)
+    free_cells_count -- (N,): число свободных клеток
+    last_move -- (N,): индекс клетки последнего хода, -1 -- ходов не было
+    available_figures -- bool-массив (N, 2 ** D): фигура ещё не сыграна
+    won -- (N,): последний ход партии собрал выигрышный отрезок
+
+    Ходы -- номера действий (см. Geometry.encode_action), маски ходов и входные плоскости --
+    в тех же раскладках, что и у BitBoard.legal_mask / BitBoard.current_state.
+    Одиночная партия по-прежнему ведётся через Node / BitBoard
+    """
+
+    def __init__(self, games_count: int, geometry: Geometry = None):
+        self.geometry: Geometry = geometry if geometry is not None else Geometry.current()
+        self.games_count = games_count
+        self.figures = np.empty((games_count, self.geometry.cells_count), dtype=np.int16)
+        self.who_moves = np.empty(games_count, dtype=np.int8)
+        self.free_cells_count = np.empty(games_count, dtype=np.int32)
+        self.last_move = np.empty(games_count, dtype=np.int32)
+        self.available_figures = np.empty(
+            (games_count, 1 << self.geometry.count_features), dtype=bool
+        )
+        self.won = np.empty(games_count, dtype=bool)
+        self.reset()
+
+    def reset(self, games: np.ndarray = None) -> None:
+        """
+        Возвращает партии games (по умолчанию -- все) в начальную позицию
+        """
+        games = slice(None) if games is None else games
+        self.figures[games] = -1
+        self.who_moves[games] = Player.Type.CROSS.value
+        self.free_cells_count[games] = self.geometry.cells_count
+        self.last_move[games] = -1
+        self.available_figures[games] = True
+        self.won[games] = False
+
+    def play(self, actions: np.ndarray, games: np.ndarray = None) -> None:
+        """
+        Делает ход actions[i] в партии games[i] (по умолчанию -- ход actions[i] в партии i)
+        и проверяет, выиграли ли этими ходами
+        """
+        geometry = self.geometry
+        games = np.arange(self.games_count) if games is None else np.asarray(games)
+        actions = np.asarray(actions)
+
+        cells = actions % geometry.cells_count
+        figures = (
+            actions // geometry.cells_count
+            + geometry.count_different_figures * self.who_moves[games]
+        )
+        self.figures[games, cells] = figures
+        self.who_moves[games] ^= 1
+        self.free_cells_count[games] -= 1
+        self.last_move[games] = cells
+        if geometry.count_features > 1:
+            self.available_figures[games, figures] = False
+
+        # отрезки через клетки ходов: (G, M, STREAK_TO_WIN)
+        window_cells, window_valid = geometry.window_table()
+        window_figures = self.figures[games[:, None, None], window_cells[cells]]
+        complete = (window_figures >= 0).all(axis=-1) & window_valid[cells]
+        same_feature = np.zeros(complete.shape, dtype=bool)
+        for k in range(geometry.count_features):
+            bits = (window_figures >> (geometry.count_features - 1 - k)) & 1
+            same_feature |= bits.min(axis=-1) == bits.max(axis=-1)
+        self.won[games] = (complete & same_feature).any(axis=-1)
+
+    def legal_masks(self) -> np.ndarray:
+        """
+        bool-маски допустимых ходов формы (N, count_different_figures * HEIGHT * WIDTH)
+        """
+        count_different_figures = self.geometry.count_different_figures
+        own_figures = (
+            self.who_moves[:, None] * count_different_figures
+            + np.arange(count_different_figures)
+        )
+        own_available = np.take_along_axis(self.available_figures, own_figures, axis=1)
+        free = self.figures == -1
+        return (own_available[:, :, None] & free[:, None, :]).reshape(
+            self.games_count, -1
+        )
+
+    def game_states(self) -> np.ndarray:
+        """
+        Состояние каждой партии -- значения GameStates формы (N,).
+        Партия, в которой не осталось допустимых ходов, считается ничьей
+        """
+        states = np.full(self.games_count, GameStates.CONTINUE.value, dtype=np.int8)
+        has_moves = self.legal_masks().any(axis=1)
+        states[~has_moves] = GameStates.TIE.value
+        # выиграл тот, кто сделал последний ход, то есть не ходящий сейчас
+        states[self.won & (self.who_moves == Player.Type.NAUGHT.value)] = (
+            GameStates.CROSS_WON.value
+        )
+        states[self.won & (self.who_moves == Player.Type.CROSS.value)] = (
+            GameStates.NAUGHT_WON.value
+        )
+        return states
+
+    def random_actions(self, rng: np.random.Generator, games: np.ndarray = None) -> np.ndarray:
+        """
+        Равновероятный допустимый ход в каждой из партий games (по умолчанию -- во всех).
+        У партий без допустимых ходов результат не определён
+        """
+        masks = self.legal_masks()
+        if games is not None:
+            masks = masks[games]
+        keys = np.where(masks, rng.random(masks.shape), -1.0)
+        return keys.argmax(axis=1)
+
+    def current_states(self) -> np.ndarray:
+        """
+        Входы сети для всех партий формы (N, 2 * D + 2, HEIGHT, WIDTH),
+        кодирование то же, что и у ListBoard.current_state
+        """
+        h, w, d = self.geometry.height, self.geometry.width, self.geometry.count_features
+        state = np.zeros((self.games_count, 2 * d + 2, h * w), dtype=np.float32)
+
+        occupied = self.figures >= 0
+        player = (self.figures >> (d - 1)) & 1
+        own = occupied & (player == self.who_moves[:, None])
+        opponent = occupied & ~own
+        state[:, 0] = own
+        state[:, 1] = opponent
+        for k in range(1, d):
+            feature = ((self.figures >> (d - 1 - k)) & 1).astype(bool)
+            state[:, 2 * k] = feature & own
+            state[:, 2 * k + 1] = feature & opponent
+
+        played = np.flatnonzero(self.last_move >= 0)
+        state[played, 2 * d, self.last_move[played]] = 1.0
+        state[self.who_moves == Player.Type.CROSS.value, 2 * d + 1] = 1.0
+
+        state = state.reshape(self.games_count, 2 * d + 2, h, w)
+        if d == 1:
+            return state[:, :, ::-1, :]
+        else:
+            return state
@@ -0,0 +1,464 @@
+from app.basic_game_core.field import Field
+from app.basic_game_core.geometry import Geometry, ZOBRIST_PRIMARY_BITS, ZOBRIST_PRIMARY_MASK
+from app.basic_game_core.player import Player
+from app.basic_game_core.threat_rollout import threat_rollout
+from typing import ForwardRef
+import numpy as np
+import random
+
+OPPONENT = {Player.Type.CROSS: Player.Type.NAUGHT, Player.Type.NAUGHT: Player.Type.CROSS}
+PLAYERS = (Player.Type.CROSS, Player.Type.NAUGHT)  # по значению Player.Type
+
+
+def mask_to_array(mask: int, size: int) -> np.ndarray:
+    """
+    Разворачивает битовую маску в массив из size нулей и единиц (младший бит -- индекс 0)
+    """
+    raw = np.frombuffer(mask.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, count=size, bitorder="little")
+
+
+class BitBoard:
+    """
+    Доска на битовых масках. Клетка (row, col) -- бит с номером row * WIDTH + col.
+
+    occupied -- маска занятых клеток
+    feature_masks[k] -- маска клеток, у фигур которых k-й разряд (слева, как в f"{figure:0Db}") равен 1;
+        feature_masks[0] -- разряд игрока
+    available_figures_mask -- i-й бит выставлен, если фигура i ещё доступна
+    zobrist -- 128-битный ключ Зобриста позиции (см. Geometry)
+    _free -- индекс свободных клеток: bool-массив длины HEIGHT * WIDTH. Строится по маске при первом
+        обращении, дальше push / pop обновляют его одной записью
+    _planes -- каналы фигур для входа сети в абсолютной раскладке (2 * D, HEIGHT * WIDTH):
+        канал 2k + p -- фигуры игрока p (0 -- крестики) с единичным k-м разрядом (k = 0 -- все фигуры игрока).
+        Ход дописывает не больше D единиц. play() не копирует массив: ребёнок ссылается на массив родителя
+        и помнит свой ход (_planes_pending), копия делается только при первом обращении или записи
+
+    Ход -- несколько операций над целыми числами вместо копирования всего поля,
+    проверка победы -- проход по предпосчитанным в Geometry отрезкам через последнюю клетку.
+
+    play(move) возвращает новую доску; push(move) / pop() меняют эту же доску на месте и
+    восстанавливают всё состояние (включая ключ Зобриста и кеш проверки победы)
+    """
+
+    __slots__ = (
+        "geometry",
+        "occupied",
+        "feature_masks",
+        "available_figures_mask",
+        "who_moves",
+        "free_cells_count",
+        "last_move",
+        "zobrist",
+        "_win",
+        "_history",
+        "_free",
+        "_planes",
+        "_planes_pending",
+        "_planes_owned",
+        "_field",
+    )
+
+    def __init__(self, geometry: Geometry = None):
+        self.geometry: Geometry = geometry if geometry is not None else Geometry.current()
+        self.occupied: int = 0
+        self.feature_masks: list[int] = [0] * self.geometry.count_features
+        self.available_figures_mask: int = (1 << (1 << self.geometry.count_features)) - 1
+        self.who_moves: Player.Type = Player.Type.CROSS
+        self.free_cells_count: int = self.geometry.cells_count
+        self.last_move: Field.Cell = Field.Cell()
+        self.zobrist: int = 0
+        self._win = None  # кеш check_win, None -- ещё не считали
+        self._history: list = []  # (предыдущий last_move, предыдущий _win) для pop
+        self._free = None
+        self._planes = None
+        self._planes_pending = None  # ход, ещё не записанный в заимствованный _planes
+        self._planes_owned = False
+        self._field = None
+
+    def play(self, move: Field.Cell) -> ForwardRef("BitBoard"):
+        """
+        Возвращает новую доску, полученную из текущей ходом move
+        """
+        d = self.geometry.count_features
+        index = move.row * self.geometry.width + move.col
+        bit = 1 << index
+        figure = move.figure
+
+        child = BitBoard.__new__(BitBoard)
+        child.geometry = self.geometry
+        child.occupied = self.occupied | bit
+        child.feature_masks = [
+            mask | bit if (figure >> (d - 1 - k)) & 1 else mask
+            for k, mask in enumerate(self.feature_masks)
+        ]
+        if d > 1:
+            child.available_figures_mask = self.available_figures_mask & ~(1 << figure)
+        else:
+            child.available_figures_mask = self.available_figures_mask
+        child.who_moves = OPPONENT[self.who_moves]
+        child.free_cells_count = self.free_cells_count - 1
+        child.last_move = move
+        child.zobrist = self.zobrist ^ self.geometry.zobrist_key(index, figure)
+        child._win = None
+        child._history = []
+        child._free = None
+        if self._planes is not None and self._planes_pending is None:
+            child._planes = self._planes
+            child._planes_pending = move
+            self._planes_owned = False
+        else:
+            child._planes = None
+            child._planes_pending = None
+        child._planes_owned = False
+        child._field = None
+        return child
+
+    def copy(self) -> ForwardRef("BitBoard"):
+        """
+        Независимая копия позиции (без истории push)
+        """
+        board = BitBoard.__new__(BitBoard)
+        board.geometry = self.geometry
+        board.occupied = self.occupied
+        board.feature_masks = self.feature_masks.copy()
+        board.available_figures_mask = self.available_figures_mask
+        board.who_moves = self.who_moves
+        board.free_cells_count = self.free_cells_count
+        board.last_move = self.last_move
+        board.zobrist = self.zobrist
+        board._win = self._win
+        board._history = []
+        board._free = None if self._free is None else self._free.copy()
+        board._planes = self._planes
+        board._planes_pending = self._planes_pending
+        board._planes_owned = False
+        self._planes_owned = False
+        board._field = self._field
+        return board
+
+    def push(self, move: Field.Cell) -> None:
+        """
+        Делает ход move на этой же доске
+        """
+        d = self.geometry.count_features
+        index = move.row * self.geometry.width + move.col
+        bit = 1 << index
+        figure = move.figure
+
+        self._history.append((self.last_move, self._win))
+        self.occupied |= bit
+        feature_masks = self.feature_masks
+        for k in range(d):
+            if (figure >> (d - 1 - k)) & 1:
+                feature_masks[k] |= bit
+        if d > 1:
+            self.available_figures_mask &= ~(1 << figure)
+        self.who_moves = OPPONENT[self.who_moves]
+        self.free_cells_count -= 1
+        self.last_move = move
+        self.zobrist ^= self.geometry.zobrist_key(index, figure)
+        self._win = None
+        if self._free is not None:
+            self._free[index] = False
+        if self._planes is not None:
+            self._write_planes(move, 1.0)
+        self._field = None
+
+    def pop(self) -> Field.Cell:
+        """
+        Отменяет последний push и возвращает отменённый ход
+        """
+        move = self.last_move
+        d = self.geometry.count_features
+        index = move.row * self.geometry.width + move.col
+        bit = 1 << index
+        figure = move.figure
+
+        self.occupied &= ~bit
+        feature_masks = self.feature_masks
+        for k in range(d):
+            if (figure >> (d - 1 - k)) & 1:
+                feature_masks[k] &= ~bit
+        if d > 1:
+            self.available_figures_mask |= 1 << figure
+        self.who_moves = OPPONENT[self.who_moves]
+        self.free_cells_count += 1
+        self.zobrist ^= self.geometry.zobrist_key(index, figure)
+        if self._planes is not None:
+            self._write_planes(move, 0.0)
+        self.last_move, self._win = self._history.pop()
+        if self._free is not None:
+            self._free[index] = True
+        self._field = None
+        return move
+
+    def push_action(self, action: int) -> None:
+        """
+        push для хода, заданного номером действия (см. Geometry)
+        """
+        self.push(self.geometry.decode_action(action, self.who_moves))
+
+    def _figure_planes(self) -> np.ndarray:
+        """
+        Каналы фигур текущей позиции, свои для этой доски (копируются из заимствованных при необходимости)
+        """
+        if self._planes is None:
+            d, size = self.geometry.count_features, self.geometry.cells_count
+            naught = self.feature_masks[0]
+            players = (self.occupied & ~naught, naught)
+            planes = np.empty((2 * d, size), dtype=np.float32)
+            for p in range(2):
+                planes[p] = mask_to_array(players[p], size)
+                for k in range(1, d):
+                    planes[2 * k + p] = mask_to_array(self.feature_masks[k] & players[p], size)
+            self._planes = planes
+            self._planes_owned = True
+        elif not self._planes_owned:
+            self._planes = self._planes.copy()
+            self._planes_owned = True
+            if self._planes_pending is not None:
+                pending, self._planes_pending = self._planes_pending, None
+                self._write_planes(pending, 1.0)
+        return self._planes
+
+    def _write_planes(self, move: Field.Cell, value: float) -> None:
+        planes = self._figure_planes()
+        d = self.geometry.count_features
+        index = move.row * self.geometry.width + move.col
+        player = (move.figure >> (d - 1)) & 1
+        planes[player, index] = value
+        for k in range(1, d):
+            if (move.figure >> (d - 1 - k)) & 1:
+                planes[2 * k + player, index] = value
+
+    @property
+    def zobrist_key(self) -> int:
+        """
+        Основной 64-битный ключ позиции
+        """
+        return self.zobrist & ZOBRIST_PRIMARY_MASK
+
+    @property
+    def zobrist_verification(self) -> int:
+        """
+        Проверочный 64-битный ключ: отличает позиции с совпавшим основным ключом
+        """
+        return self.zobrist >> ZOBRIST_PRIMARY_BITS
+
+    @property
+    def available_figures(self) -> set[int]:
+        return {
+            figure
+            for figure in range(1 << self.geometry.count_features)
+            if (self.available_figures_mask >> figure) & 1
+        }
+
+    def get_figure(self, row: int, col: int) -> int:
+        index = row * self.geometry.width + col
+        if not (self.occupied >> index) & 1:
+            return -1
+        figure = 0
+        for mask in self.feature_masks:
+            figure = (figure << 1) | ((mask >> index) & 1)
+        return figure
+
+    @property
+    def field(self) -> list[list[int]]:
+        """
+        Поле в виде списка списков (как у ListBoard). Строится один раз на доску -- только для чтения
+        """
+        if self._field is None:
+            self._field = [
+                [self.get_figure(row, col) for col in range(self.geometry.width)]
+                for row in range(self.geometry.height)
+            ]
+        return self._field
+
+    def free_cells_plane(self) -> np.ndarray:
+        """
+        bool-массив свободных клеток длины HEIGHT * WIDTH (не изменять снаружи)
+        """
+        if self._free is None:
+            self._free = mask_to_array(
+                self.geometry.full_mask & ~self.occupied, self.geometry.cells_count
+            ).astype(bool)
+        return self._free
+
+    def _available_figure_indices(self) -> list[int]:
+        """
+        Доступные фигуры ходящего игрока в виде индексов figure % count_different_figures
+        """
+        count_different_figures = 1 << (self.geometry.count_features - 1)
+        shift = count_different_figures * self.who_moves.value
+        return [
+            figure
+            for figure in range(count_different_figures)
+            if (self.available_figures_mask >> (figure + shift)) & 1
+        ]
+
+    @property
+    def legal_moves_count(self) -> int:
+        return self.free_cells_count * len(self._available_figure_indices())
+
+    def legal_mask(self) -> np.ndarray:
+        """
+        bool-маска допустимых ходов в раскладке выхода policy-сети:
+        индекс (figure % count_different_figures) * HEIGHT * WIDTH + row * WIDTH + col
+        """
+        count_different_figures = 1 << (self.geometry.count_features - 1)
+        free = self.free_cells_plane()
+        mask = np.zeros((count_different_figures, self.geometry.cells_count), dtype=bool)
+        for figure in self._available_figure_indices():
+            mask[figure] = free
+        return mask.reshape(-1)
+
+    def legal_actions(self) -> list[int]:
+        """
+        Номера допустимых действий по возрастанию (порядок iter_legal_moves)
+        """
+        cells_count = self.geometry.cells_count
+        free_cells = np.flatnonzero(self.free_cells_plane())
+        return [
+            action
+            for figure in self._available_figure_indices()
+            for action in (free_cells + figure * cells_count).tolist()
+        ]
+
+    def iter_legal_moves(self):
+        """
+        Допустимые ходы по одному, в том же порядке, что и в legal_mask
+        """
+        width = self.geometry.width
+        shift = (1 << (self.geometry.count_features - 1)) * self.who_moves.value
+        free_cells = np.flatnonzero(self.free_cells_plane()).tolist()
+        for figure in self._available_figure_indices():
+            for index in free_cells:
+                yield Field.Cell(index // width, index % width, figure + shift)
+
+    def get_available_moves(self) -> list[Field.Cell]:
+        return list(self.iter_legal_moves())
+
+    def check_win(self) -> bool:
+        """
+        Проверяет, закончилась ли игра победой
+        """
+        if self._win is None:
+            self._win = self.last_move.row != -1 and self.geometry.is_winning_move(
+                self.last_move.row * self.geometry.width + self.last_move.col,
+                self.occupied,
+                self.feature_masks,
+            )
+        return self._win
+
+    def random_rollout(self, moves: list[int] = None) -> Player.Type:
+        """
+        Доигрывает партию случайными ходами и возвращает победителя (Player.Type.NONE -- ничья).
+        Доска не меняется: партия идёт на локальных масках, клетки берутся из заранее перемешанного
+        списка свободных, фигуры -- из перемешанных списков доступных фигур, победа проверяется только
+        через клетку очередного хода. Партия, в которой у ходящего кончились фигуры, -- ничья.
+        moves -- если передан, в него дописываются номера действий сделанных ходов
+        """
+        if self.check_win():
+            return OPPONENT[self.who_moves]
+
+        geometry = self.geometry
+        d = geometry.count_features
+        cells = np.flatnonzero(self.free_cells_plane()).tolist()
+        random.shuffle(cells)
+
+        occupied = self.occupied
+        feature_masks = list(self.feature_masks)
+        who = self.who_moves.value
+        figures = None
+        if d > 1:
+            count_different_figures = geometry.count_different_figures
+            figures = []
+            for player in range(2):
+                player_figures = [
+                    figure
+                    for figure in range(
+                        player * count_different_figures,
+                        (player + 1) * count_different_figures,
+                    )
+                    if (self.available_figures_mask >> figure) & 1
+                ]
+                random.shuffle(player_figures)
+                figures.append(player_figures)
+
+        for index in cells:
+            bit = 1 << index
+            occupied |= bit
+            if figures is None:
+                figure = who
+                if who:
+                    feature_masks[0] |= bit
+            else:
+                if not figures[who]:
+                    return Player.Type.NONE
+                figure = figures[who].pop()
+                for k in range(d):
+                    if (figure >> (d - 1 - k)) & 1:
+                        feature_masks[k] |= bit
+            if moves is not None:
+                moves.append(geometry.action_offset[figure] + index)
+            if geometry.is_winning_move(index, occupied, feature_masks):
+                return PLAYERS[who]
+            who ^= 1
+
+        return Player.Type.NONE
+
+    def threat_rollout(self, moves: list[int] = None) -> Player.Type:
+        """
+        Доигрывает партию ходами с угрозами (см. app.basic_game_core.threat_rollout): выигрыш в один ход
+        берётся, выигрыш соперника в один ход закрывается, остальные ходы -- случайные.
+        Возвращает победителя (Player.Type.NONE -- ничья), доска не меняется.
+        moves -- если передан, в него дописываются номера действий сделанных ходов
+        """
+        if self.check_win():
+            return OPPONENT[self.who_moves]
+        return threat_rollout(
+            self.geometry,
+            self.occupied,
+            list(self.feature_masks),
+            self.available_figures_mask,
+            self.who_moves.value,
+            np.flatnonzero(self.free_cells_plane()).tolist(),
+            moves,
+        )
+
+    def current_state(self):
+        """
+        То же кодирование, что и у ListBoard.current_state. Каналы фигур берутся из поддерживаемых
+        по ходу _planes: для ходящего игрока пары каналов (2k, 2k + 1) переставляются местами
+        """
+        h, w, d = self.geometry.height, self.geometry.width, self.geometry.count_features
+        planes = self._figure_planes()
+        state = np.zeros((2 * d + 2, h * w), dtype=np.float32)
+
+        if self.who_moves == Player.Type.CROSS:
+            state[: 2 * d] = planes
+            state[2 * d + 1] = 1.0
+        else:
+            state[0 : 2 * d : 2] = planes[1::2]
+            state[1 : 2 * d : 2] = planes[0::2]
+
+        if self.last_move != Field.Cell():
+            state[2 * d, self.last_move.row * w + self.last_move.col] = 1.0
+
+        state = state.reshape(2 * d + 2, h, w)
+        if d == 1:
+            return state[:, ::-1, :]
+        else:
+            return state
+
+    def __hash__(self):
+        return self.zobrist_key
+
+    def __eq__(self, other):
+        if not isinstance(other, BitBoard):
+            return False
+        return (
+            self.occupied == other.occupied
+            and self.feature_masks == other.feature_masks
+        )
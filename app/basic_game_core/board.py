@@ -0,0 +1,342 @@
+from app.basic_game_core.field import Field
+from app.basic_game_core.geometry import Geometry, ZOBRIST_PRIMARY_BITS, ZOBRIST_PRIMARY_MASK
+from app.basic_game_core.player import Player
+from app.basic_game_core.threat_rollout import threat_rollout
+from typing import ForwardRef
+import copy
+import numpy as np
+import random
+
+DIRECTIONS = tuple(
+    [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
+)
+
+
+class ListBoard:
+    """
+    Классическое представление доски: список списков с фигурами (-1 -- пустая клетка).
+    play(move) создаёт копию поля через deepcopy, push(move) / pop() меняют эту же доску
+    """
+
+    def __init__(self, geometry: Geometry = None):
+        self.geometry: Geometry = geometry if geometry is not None else Geometry.current()
+        self.who_moves: Player.Type = Player.Type.CROSS
+        self.field: list[list[int]] = [
+            [-1 for _ in range(self.geometry.width)] for _ in range(self.geometry.height)
+        ]
+        self.free_cells_count: int = self.geometry.cells_count
+        self.last_move: Field.Cell = Field.Cell()
+        self.available_figures = set(range(1 << self.geometry.count_features))
+        self.zobrist: int = 0
+        self._win = None
+        self._history: list = []
+
+    def play(self, move: Field.Cell) -> ForwardRef("ListBoard"):
+        """
+        Возвращает новую доску, полученную из текущей ходом move
+        """
+        child = ListBoard.__new__(ListBoard)
+        child.geometry = self.geometry
+        child.field = copy.deepcopy(self.field)
+        child.field[move.row][move.col] = move.figure
+        child.who_moves = Player.Type(abs(self.who_moves.value - 1))
+        child.free_cells_count = self.free_cells_count - 1
+        child.last_move = move
+        child.available_figures = self.available_figures.copy()
+        if self.geometry.count_features > 1:
+            child.available_figures.remove(move.figure)
+        child.zobrist = self.zobrist ^ self.geometry.zobrist_key(
+            move.row * self.geometry.width + move.col, move.figure
+        )
+        child._win = None
+        child._history = []
+        return child
+
+    def copy(self) -> ForwardRef("ListBoard"):
+        """
+        Независимая копия позиции (без истории push)
+        """
+        board = ListBoard.__new__(ListBoard)
+        board.geometry = self.geometry
+        board.field = copy.deepcopy(self.field)
+        board.who_moves = self.who_moves
+        board.free_cells_count = self.free_cells_count
+        board.last_move = self.last_move
+        board.available_figures = self.available_figures.copy()
+        board.zobrist = self.zobrist
+        board._win = self._win
+        board._history = []
+        return board
+
+    def push(self, move: Field.Cell) -> None:
+        """
+        Делает ход move на этой же доске
+        """
+        self._history.append((self.last_move, self._win))
+        self.field[move.row][move.col] = move.figure
+        self.who_moves = Player.Type(abs(self.who_moves.value - 1))
+        self.free_cells_count -= 1
+        self.last_move = move
+        if self.geometry.count_features > 1:
+            self.available_figures.remove(move.figure)
+        self.zobrist ^= self.geometry.zobrist_key(
+            move.row * self.geometry.width + move.col, move.figure
+        )
+        self._win = None
+
+    def pop(self) -> Field.Cell:
+        """
+        Отменяет последний push и возвращает отменённый ход
+        """
+        move = self.last_move
+        self.field[move.row][move.col] = -1
+        self.who_moves = Player.Type(abs(self.who_moves.value - 1))
+        self.free_cells_count += 1
+        if self.geometry.count_features > 1:
+            self.available_figures.add(move.figure)
+        self.zobrist ^= self.geometry.zobrist_key(
+            move.row * self.geometry.width + move.col, move.figure
+        )
+        self.last_move, self._win = self._history.pop()
+        return move
+
+    def push_action(self, action: int) -> None:
+        """
+        push для хода, заданного номером действия (см. Geometry)
+        """
+        self.push(self.geometry.decode_action(action, self.who_moves))
+
+    @property
+    def zobrist_key(self) -> int:
+        return self.zobrist & ZOBRIST_PRIMARY_MASK
+
+    @property
+    def zobrist_verification(self) -> int:
+        return self.zobrist >> ZOBRIST_PRIMARY_BITS
+
+    def get_figure(self, row: int, col: int) -> int:
+        return self.field[row][col]
+
+    def free_cells_plane(self) -> np.ndarray:
+        """
+        bool-массив свободных клеток длины HEIGHT * WIDTH
+        """
+        return np.array(self.field).reshape(-1) == -1
+
+    def _available_figure_indices(self) -> list[int]:
+        count_different_figures = 1 << (self.geometry.count_features - 1)
+        shift = count_different_figures * self.who_moves.value
+        return [
+            figure
+            for figure in range(count_different_figures)
+            if (figure + shift) in self.available_figures
+        ]
+
+    @property
+    def legal_moves_count(self) -> int:
+        return self.free_cells_count * len(self._available_figure_indices())
+
+    def legal_mask(self) -> np.ndarray:
+        """
+        bool-маска допустимых ходов в раскладке выхода policy-сети
+        """
+        count_different_figures = 1 << (self.geometry.count_features - 1)
+        free = self.free_cells_plane()
+        mask = np.zeros((count_different_figures, free.size), dtype=bool)
+        for figure in self._available_figure_indices():
+            mask[figure] = free
+        return mask.reshape(-1)
+
+    def legal_actions(self) -> list[int]:
+        """
+        Номера допустимых действий по возрастанию
+        """
+        return np.flatnonzero(self.legal_mask()).tolist()
+
+    def iter_legal_moves(self):
+        count_different_figures = 1 << (self.geometry.count_features - 1)
+        shift = count_different_figures * self.who_moves.value
+        for figure in self._available_figure_indices():
+            for i in range(self.geometry.height):
+                for j in range(self.geometry.width):
+                    if self.field[i][j] == -1:
+                        yield Field.Cell(i, j, figure + shift)
+
+    def get_available_moves(self) -> list[Field.Cell]:
+        return list(self.iter_legal_moves())
+
+    def check_win(self) -> bool:
+        """
+        Проверяет, закончилась ли игра победой
+        """
+
+        if self._win is None:
+            self._win = self._check_win()
+        return self._win
+
+    def _check_win(self) -> bool:
+        if self.last_move.row == -1:
+            return False
+
+        last_move_cell = f"{self.field[self.last_move.row][self.last_move.col]:0{self.geometry.count_features}b}"
+
+        for i in range(self.geometry.count_features):
+
+            for direction in range(4):
+                count = 1
+
+                for _ in range(2):
+                    row = self.last_move.row + DIRECTIONS[direction][0]
+                    col = self.last_move.col + DIRECTIONS[direction][1]
+
+                    while (
+                        0 <= row < self.geometry.height
+                        and 0 <= col < self.geometry.width
+                        and self.field[row][col] != -1
+                        and f"{self.field[row][col]:0{self.geometry.count_features}b}"[i]
+                        == last_move_cell[i]
+                    ):
+                        count += 1
+                        row += DIRECTIONS[direction][0]
+                        col += DIRECTIONS[direction][1]
+
+                    direction = (direction + 4) % 8
+
+                if count >= self.geometry.streak:
+                    return True
+
+        return False
+
+    def random_rollout(self, moves: list[int] = None) -> Player.Type:
+        """
+        Доигрывает партию случайными ходами и возвращает победителя (Player.Type.NONE -- ничья).
+        Ходы делаются через push и затем отменяются; клетки и фигуры берутся из перемешанных списков.
+        Партия, в которой у ходящего кончились фигуры, -- ничья.
+        moves -- если передан, в него дописываются номера действий сделанных ходов
+        """
+        cells = [
+            (row, col)
+            for row in range(self.geometry.height)
+            for col in range(self.geometry.width)
+            if self.field[row][col] == -1
+        ]
+        random.shuffle(cells)
+        count_different_figures = self.geometry.count_different_figures
+        figures = []
+        for player in range(2):
+            player_figures = [
+                figure
+                for figure in range(
+                    player * count_different_figures, (player + 1) * count_different_figures
+                )
+                if figure in self.available_figures
+            ]
+            random.shuffle(player_figures)
+            figures.append(player_figures)
+
+        winner = Player.Type.NONE
+        depth = 0
+        while not self.check_win():
+            if depth == len(cells):
+                break
+            who = self.who_moves.value
+            if self.geometry.count_features == 1:
+                figure = who
+            elif figures[who]:
+                figure = figures[who].pop()
+            else:
+                break
+            move = Field.Cell(*cells[depth], figure)
+            self.push(move)
+            if moves is not None:
+                moves.append(self.geometry.encode_action(move))
+            depth += 1
+        else:
+            winner = Player.Type(abs(self.who_moves.value - 1))
+
+        for _ in range(depth):
+            self.pop()
+        return winner
+
+    def threat_rollout(self, moves: list[int] = None) -> Player.Type:
+        """
+        Доигрывает партию ходами с угрозами (см. app.basic_game_core.threat_rollout) на масках,
+        собранных по полю. Возвращает победителя (Player.Type.NONE -- ничья), доска не меняется.
+        moves -- если передан, в него дописываются номера действий сделанных ходов
+        """
+        if self.check_win():
+            return Player.Type(abs(self.who_moves.value - 1))
+        d = self.geometry.count_features
+        occupied = 0
+        feature_masks = [0] * d
+        cells = []
+        for index in range(self.geometry.cells_count):
+            figure = self.field[index // self.geometry.width][index % self.geometry.width]
+            if figure == -1:
+                cells.append(index)
+                continue
+            occupied |= 1 << index
+            for k in range(d):
+                if (figure >> (d - 1 - k)) & 1:
+                    feature_masks[k] |= 1 << index
+        available_figures_mask = 0
+        for figure in self.available_figures:
+            available_figures_mask |= 1 << figure
+        return threat_rollout(
+            self.geometry,
+            occupied,
+            feature_masks,
+            available_figures_mask,
+            self.who_moves.value,
+            cells,
+            moves,
+        )
+
+    def current_state(self):
+        """
+        Возвращает текущее состояние доски в виде np.array формы (2*FEATURES+2, HEIGHT, WIDTH):
+        каналы 0-1: клетки текущего игрока и клетки соперника
+        каналы 2-2D-1: по 2 канала на каждое из D-1 свойств
+        канал 2D: последняя сыгранная клетка
+        канал 2D+1: чей ход
+        """
+        h, w, d = self.geometry.height, self.geometry.width, self.geometry.count_features
+        state = np.zeros((2 * d + 2, h, w), dtype=np.float32)
+
+        current = self.who_moves.value
+
+        # Каналы 0, ..., 2D - 1
+        for i in range(h):
+            for j in range(w):
+                figure = self.field[i][j]
+                if figure == -1:
+                    continue
+
+                binary = f"{figure:0{d}b}"
+                shift = int(int(binary[0]) != current)
+                state[shift, i, j] = 1.0
+
+                for k in range(1, d):
+                    if int(binary[k]):
+                        state[2 * k + shift, i, j] = 1.0
+
+        # Последний ход
+        if self.last_move != Field.Cell():
+            state[2 * d, self.last_move.row, self.last_move.col] = 1.0
+
+        # Чей ход
+        if self.who_moves == Player.Type.CROSS:
+            state[2 * d + 1, :, :] = 1.0
+
+        if d == 1:
+            return state[:, ::-1, :]
+        else:
+            return state
+
+    def __hash__(self):
+        return self.zobrist_key
+
+    def __eq__(self, other):
+        if not isinstance(other, ListBoard):
+            return False
+        return self.field == other.field
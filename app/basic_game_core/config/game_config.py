@@ -7,8 +7,29 @@ CONST_FIELD_WIDTH = 2
 CONST_STREAK_TO_WIN_SIZE = 2
 CONST_COUNT_FEATURES = 2
 
+BOARD_ENGINE = "bitboard"  # "bitboard" -- битовые маски, "list" -- поле списком списков
 
+
+MCTS_TREE = "array"  # "object" -- узлы TreeNode, "array" -- дерево-структура массивов ArrayTree
+MCTS_TRANSPOSITIONS = False  # True -- таблица транспозиций: одна позиция -- один узел при любом порядке ходов
 MCTS_ITERATIONS = 10000
+MCTS_WORKERS = 1  # > 1 -- параллельный по корню поиск чистого MCTS в стольких процессах
+MCTS_PLAYOUTS_PER_WORKER = 0  # плейауты на процесс; 0 -- поровну делить MCTS_ITERATIONS между процессами
+MCTS_THREADS = 1  # > 1 -- параллельный по дереву поиск: столько потоков на одном дереве
+MCTS_VIRTUAL_LOSS = 3  # виртуальная потеря на узлах пути, пока плейаут потока не закончен
+MCTS_TIME_BUDGET = 0  # секунд на ход; поиск останавливается в срок, даже не сделав всех плейаутов. 0 -- без предела
+MCTS_NODE_BUDGET = 0  # наибольшее число узлов дерева, после которого поиск останавливается. 0 -- без предела
+MCTS_MAX_TREE_NODES = 0  # потолок узлов дерева: при его достижении редко посещённые поддеревья удаляются. 0 -- без предела
+MCTS_EARLY_STOP = False  # True -- останавливать поиск, когда лучший ход уже нельзя обогнать (в self-play AlphaZero -- всегда выключено)
+MCTS_SOLVER = False  # True -- MCTS-Solver: доказанные выигрыши и проигрыши поднимаются по дереву, доказанные поддеревья не ищутся (в self-play AlphaZero -- всегда выключен)
+MCTS_ROLLOUT = "random"  # доигрывание чистого MCTS: "random" -- случайные ходы, "threat" -- с выигрышами и защитой в один ход
+MCTS_RAVE = False  # RAVE для чистого MCTS: оценки ходов смешиваются с AMAF-статистикой всех ходов доигрывания
+MCTS_RAVE_EQUIVALENCE = 1000  # посещения ребёнка, при которых у его оценки и AMAF-оценки примерно равный вес
+MCTS_CANDIDATE_RADIUS = 0  # > 0 -- раскрывать только ходы на расстоянии Чебышёва не больше этого от занятых клеток. 0 -- все ходы
+MCTS_WIDENING = 0  # прогрессивное расширение: у узла с N посещениями ceil(C * N^alpha) детей, остальные ходы добавляются с посещениями, C -- это значение. 0 -- выключено
+MCTS_WIDENING_EXPONENT = 0.5  # alpha прогрессивного расширения
+MCTS_PONDER = False  # True -- MCTS-игроки продолжают поиск от своего корня, пока думает соперник
+MCTS_PONDER_NODE_BUDGET = 1000000  # потолок узлов дерева при обдумывании, если MCTS_NODE_BUDGET не задан
 MCTS_AZ_ITERATIONS = 500
 MAX_FIELD_SIZE_FOR_SOLVER = (
     0  # наибольшая из сторон не должна превышать этот размер для подключения солвера
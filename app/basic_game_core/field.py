@@ -22,6 +22,8 @@ class Field:
         cls.COUNT_FEATURES = features
 
     class Cell:
+        __slots__ = ("row", "col", "figure")
+
         def __init__(self, row=-1, col=-1, figure=-1):
             self.row = row
             self.col = col
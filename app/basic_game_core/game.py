@@ -4,7 +4,9 @@ from app.basic_game_core.config.game_config import (
     MAX_FIELD_SIZE_FOR_SOLVER,
 )
 from app.basic_game_core.field import Field, GameStates
+from app.basic_game_core.geometry import Geometry
 from app.basic_game_core.player import Player
+from app.basic_game_core.batch_board import BatchBoard
 from app.basic_game_core.node import Node
 from app.mcts.mcts import MCTSPlayer
 from app.solver.solver import get_position_status_and_best_move
@@ -22,15 +24,16 @@ class Game:
         ROLL_BACK = 2
         ERROR = 3
 
-    def __init__(self, mcts_player: MCTSPlayer) -> None:
+    def __init__(self, mcts_player: MCTSPlayer, geometry: Geometry = None) -> None:
         """
-        Выводит информацию о игре
+        Выводит информацию о игре. geometry -- размеры партии (по умолчанию -- текущие размеры Field)
         """
 
         print("Welcome to the MxNxK game! :D")
         print(PROGRAM_VERSION, PROGRAM_VERSION_DESCRIPTION)
         self.mcts_player: MCTSPlayer = mcts_player
-        self.current_state: ForwardRef("Node") = Node()
+        self.geometry: Geometry = geometry if geometry is not None else Geometry.current()
+        self.current_state: ForwardRef("Node") = Node(geometry=self.geometry)
 
     def start_processing_input(self):
         """
@@ -60,14 +63,14 @@ class Game:
             )
 
         if (
-            min(Field.HEIGHT, Field.WIDTH) < 1
+            min(self.geometry.height, self.geometry.width) < 1
         ):  # косяк. #TODO надо бы пользователя уведомить, В ЧЕМ ИМЕННО он не прав по жизни...
             return
 
         while True:
             self.__print_field()
 
-            if max(Field.HEIGHT, Field.WIDTH) <= MAX_FIELD_SIZE_FOR_SOLVER:
+            if max(self.geometry.height, self.geometry.width) <= MAX_FIELD_SIZE_FOR_SOLVER:
                 __print_prediction_with_solver()
             if self.current_state.who_moves == Player.Type.NAUGHT:
                 __print_prediction_no_solver()
@@ -105,7 +108,7 @@ Your command is >   """
 
         def __print_horizontal_line():
             for i in range(
-                4 + (Field.WIDTH * 4) + 1
+                4 + (self.geometry.width * 4) + 1
             ):  # клетка + левая граница дают 4 (первая клетка -- под №), одной границы не хватает
                 print("-" if i % 4 else "+", end="")
             print()
@@ -113,7 +116,7 @@ Your command is >   """
         def __enumerate_columns():
             print(
                 "|  №|"
-                + "|".join([str(i)[-3:].rjust(3) for i in range(Field.WIDTH)])
+                + "|".join([str(i)[-3:].rjust(3) for i in range(self.geometry.width)])
                 + "|"
             )
 
@@ -122,9 +125,9 @@ Your command is >   """
             print(
                 " | ".join(
                     (
-                        f"{cell:0{Field.COUNT_FEATURES}b}"
+                        f"{cell:0{self.geometry.count_features}b}"
                         if cell != -1
-                        else "-" * Field.COUNT_FEATURES
+                        else "-" * self.geometry.count_features
                     )
                     for cell in row
                 ),
@@ -150,7 +153,7 @@ Your command is >   """
 
         def __wrong_ceil_chosen() -> None:
             print(
-                f"Invalid coordinates! You must choose a free cell within [0, 0]--[{Field.HEIGHT - 1}, {Field.WIDTH - 1}]. Try again please"
+                f"Invalid coordinates! You must choose a free cell within [0, 0]--[{self.geometry.height - 1}, {self.geometry.width - 1}]. Try again please"
             )
 
         if len(user_input.split()) == 2 and all(
@@ -158,8 +161,8 @@ Your command is >   """
         ):
             row, column = [int(num) for num in user_input.split()]
 
-            if (0 <= row and row < Field.HEIGHT) and (
-                0 <= column and column < Field.WIDTH
+            if (0 <= row and row < self.geometry.height) and (
+                0 <= column and column < self.geometry.width
             ):
                 return True
             else:
@@ -235,7 +238,7 @@ Your command is >   """
 
         def __wrong_ceil_chosen() -> None:
             print(
-                f"Invalid coordinates! You must choose a free cell within [0, 0]--[{Field.HEIGHT - 1}, {Field.WIDTH - 1}]. Try again please"
+                f"Invalid coordinates! You must choose a free cell within [0, 0]--[{self.geometry.height - 1}, {self.geometry.width - 1}]. Try again please"
             )
 
         def __successful_move() -> None:
@@ -258,7 +261,7 @@ Your command is >   """
         """
         обработка хода начинается
         """
-        if not (0 <= row < Field.HEIGHT and 0 <= column < Field.WIDTH):
+        if not (0 <= row < self.geometry.height and 0 <= column < self.geometry.width):
             __wrong_ceil_chosen()
             return
 
@@ -318,9 +321,14 @@ Your command is >   """
 
                 return winner, zip(states, mcts_probs, winners_z)
 
-    def start_bot_play(self, player1, player2, start_player: int) -> Player.Type:
+    def start_bot_play(
+        self, player1, player2, start_player: int, ponder: bool = False
+    ) -> Player.Type:
         """
         player1, player2: MCTS_alphazero_player | MCTS_pure_player
+        ponder -- после своего хода бот обдумывает на времени соперника (если обдумывание у него включено).
+        По умолчанию выключено: поток обдумывания отнимает процессор у считающего соперника
+        и искажает результаты и замеры матча
         """
         self.__reset_game()
 
@@ -348,12 +356,30 @@ Your command is >   """
                 else:
                     return start_player == 1
 
+            if ponder:
+                players[current].start_pondering()
             current, opponent = opponent, current
 
+    def start_batch_random_play(self, games_count: int, seed: int = None) -> np.ndarray:
+        """
+        Играет games_count партий случайными ходами одновременно на BatchBoard:
+        на каждом шаге -- один векторный ход во всех ещё не законченных партиях.
+        Возвращает итоговые состояния партий (значения GameStates)
+        """
+        rng = np.random.default_rng(seed)
+        boards = BatchBoard(games_count, self.geometry)
+        game_states = boards.game_states()
+        while True:
+            playing = np.flatnonzero(game_states == GameStates.CONTINUE.value)
+            if playing.size == 0:
+                return game_states
+            boards.play(boards.random_actions(rng, playing), playing)
+            game_states = boards.game_states()
+
     def __reset_game(self) -> None:
         """
         Сбрасывает игровое поле
         """
-        self.current_state = Node()
+        self.current_state = Node(geometry=self.geometry)
         if self.mcts_player:
             self.mcts_player.reset_player()
@@ -0,0 +1,217 @@
+from app.basic_game_core.field import Field
+from typing import ForwardRef
+import numpy as np
+import random
+
+LINE_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+ZOBRIST_PRIMARY_BITS = 64
+ZOBRIST_PRIMARY_MASK = (1 << ZOBRIST_PRIMARY_BITS) - 1
+ZOBRIST_TABLE_LIMIT = 1 << 16  # при большем числе пар (фигура, клетка) ключи хода собираются на лету
+ACTION_TABLE_LIMIT = 1 << 20  # при большем числе действий ход по действию восстанавливается делением
+
+
+class Geometry:
+    """
+    Геометрия поля HEIGHT x WIDTH с победной серией STREAK_TO_WIN и COUNT_FEATURES свойствами.
+
+    Предпосчитанные таблицы (одни на всю конфигурацию, общие для всех досок):
+    windows -- отрезки длины STREAK_TO_WIN, каждый -- кортеж индексов клеток (клетка (row, col) -- индекс row * WIDTH + col)
+    window_masks -- те же отрезки в виде пар (start, pattern), как в windows_through_cell
+    windows_through_cell[index] -- отрезки через клетку index в виде пар (start, pattern):
+        маска отрезка равна pattern << start, где pattern -- одна из четырёх масок-направлений
+    zobrist_cell, zobrist_feature -- 128-битные ключи Зобриста: ключ фигуры figure в клетке index равен
+        zobrist_cell[index] ^ zobrist_feature[k][index] по всем единичным разрядам k фигуры.
+        Младшие 64 бита ключа позиции -- основной ключ, старшие 64 -- проверочный
+    actions_count, action_offset, action_cell, action_figure -- кодек действий: ход Field.Cell
+        в поиске заменяется целым action = (figure % count_different_figures) * HEIGHT * WIDTH + row * WIDTH + col,
+        то есть индексом в раскладке выхода policy-сети. action_offset[figure] -- слагаемое фигуры,
+        action_cell[action] и action_figure[action] -- обратные таблицы (индекс клетки и фигура без разряда игрока),
+        cell_row[index] и cell_col[index] -- строка и столбец клетки
+    symmetries -- перестановки индексов клеток для аугментации: плоскость plane (длины HEIGHT * WIDTH)
+        переходит в plane[permutation]. Для квадратного поля -- повороты на 90, 180, 270 градусов
+        и их отражения слева направо, для прямоугольного -- поворот на 180 градусов и его отражение
+
+    Геометрия -- неизменяемый объект, одна на конфигурацию: доски, узлы, поиск и сеть получают её явно,
+    так что в одном процессе можно держать партии разных размеров
+    """
+
+    _cache: dict[tuple[int, int, int, int], ForwardRef("Geometry")] = {}
+
+    def __init__(self, height: int, width: int, streak: int, count_features: int):
+        self.height = height
+        self.width = width
+        self.streak = streak
+        self.count_features = count_features
+        self.cells_count = height * width
+        self.full_mask = (1 << self.cells_count) - 1
+
+        self.windows: list[tuple[int, ...]] = []
+        self.window_masks: list[tuple[int, int]] = []
+        windows_through_cell: list[list[tuple[int, int]]] = [
+            [] for _ in range(self.cells_count)
+        ]
+        seen = set()
+        for d_row, d_col in LINE_DIRECTIONS:
+            for row in range(height):
+                for col in range(width):
+                    end_row = row + d_row * (streak - 1)
+                    end_col = col + d_col * (streak - 1)
+                    if not (0 <= end_row < height and 0 <= end_col < width):
+                        continue
+
+                    cells = tuple(
+                        (row + d_row * i) * width + col + d_col * i
+                        for i in range(streak)
+                    )
+                    if cells[0] > cells[-1]:
+                        cells = cells[::-1]
+                    if cells in seen:  # при streak == 1 направления совпадают
+                        continue
+                    seen.add(cells)
+
+                    start = cells[0]
+                    pattern = 0
+                    for index in cells:
+                        pattern |= 1 << (index - start)
+
+                    self.windows.append(cells)
+                    self.window_masks.append((start, pattern))
+                    for index in cells:
+                        windows_through_cell[index].append((start, pattern))
+
+        self.windows_through_cell: tuple[tuple[tuple[int, int], ...], ...] = tuple(
+            tuple(cell_windows) for cell_windows in windows_through_cell
+        )
+
+        # ключи детерминированы для конфигурации, чтобы совпадать в разных процессах
+        rng = random.Random(f"{height}x{width}x{streak}x{count_features}")
+        self.zobrist_cell: list[int] = [
+            rng.getrandbits(2 * ZOBRIST_PRIMARY_BITS) for _ in range(self.cells_count)
+        ]
+        self.zobrist_feature: list[list[int]] = [
+            [rng.getrandbits(2 * ZOBRIST_PRIMARY_BITS) for _ in range(self.cells_count)]
+            for _ in range(count_features)
+        ]
+        self._zobrist_moves = None
+        if (1 << count_features) * self.cells_count <= ZOBRIST_TABLE_LIMIT:
+            self._zobrist_moves = [
+                [
+                    self._compose_zobrist_key(index, figure)
+                    for index in range(self.cells_count)
+                ]
+                for figure in range(1 << count_features)
+            ]
+
+        self.cell_row: list[int] = [index // width for index in range(self.cells_count)]
+        self.cell_col: list[int] = [index % width for index in range(self.cells_count)]
+        self.count_different_figures = 1 << (count_features - 1)
+        self.actions_count = self.count_different_figures * self.cells_count
+        self.action_offset: list[int] = [
+            (figure % self.count_different_figures) * self.cells_count
+            for figure in range(1 << count_features)
+        ]
+        self.action_cell = None
+        self.action_figure = None
+        if self.actions_count <= ACTION_TABLE_LIMIT:
+            self.action_cell: list[int] = list(range(self.cells_count)) * self.count_different_figures
+            self.action_figure: list[int] = [
+                action // self.cells_count for action in range(self.actions_count)
+            ]
+
+        self._window_table = None
+
+        grid = np.arange(self.cells_count).reshape(height, width)
+        self.symmetries: list[np.ndarray] = []
+        for k in [1, 2, 3] if height == width else [2]:
+            rotated = np.rot90(grid, k)
+            self.symmetries.append(rotated.reshape(-1))
+            self.symmetries.append(np.fliplr(rotated).reshape(-1))
+
+    @classmethod
+    def get(
+        cls, height: int, width: int, streak: int, count_features: int
+    ) -> ForwardRef("Geometry"):
+        """
+        Возвращает геометрию для конфигурации, строит таблицы только при первом обращении
+        """
+        key = (height, width, streak, count_features)
+        if key not in cls._cache:
+            cls._cache[key] = cls(height, width, streak, count_features)
+        return cls._cache[key]
+
+    @classmethod
+    def current(cls) -> ForwardRef("Geometry"):
+        """
+        Геометрия текущих размеров Field
+        """
+        return cls.get(Field.HEIGHT, Field.WIDTH, Field.STREAK_TO_WIN, Field.COUNT_FEATURES)
+
+    def _compose_zobrist_key(self, index: int, figure: int) -> int:
+        key = self.zobrist_cell[index]
+        for k in range(self.count_features):
+            if (figure >> (self.count_features - 1 - k)) & 1:
+                key ^= self.zobrist_feature[k][index]
+        return key
+
+    def zobrist_key(self, index: int, figure: int) -> int:
+        """
+        128-битный ключ фигуры figure в клетке index: ключ позиции меняется одним XOR на ход
+        """
+        if self._zobrist_moves is not None:
+            return self._zobrist_moves[figure][index]
+        return self._compose_zobrist_key(index, figure)
+
+    def encode_action(self, move: Field.Cell) -> int:
+        """
+        Номер действия для хода move
+        """
+        return self.action_offset[move.figure] + move.row * self.width + move.col
+
+    def decode_action(self, action: int, who_moves) -> Field.Cell:
+        """
+        Ход игрока who_moves, соответствующий действию action
+        """
+        if self.action_cell is not None:
+            index, figure = self.action_cell[action], self.action_figure[action]
+        else:
+            figure, index = divmod(action, self.cells_count)
+        return Field.Cell(
+            self.cell_row[index],
+            self.cell_col[index],
+            figure + self.count_different_figures * who_moves.value,
+        )
+
+    def window_table(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Отрезки через каждую клетку массивами для векторной проверки победы (строятся при первом вызове):
+        cells[index] -- int-массив (M, STREAK_TO_WIN) индексов клеток отрезков через index,
+        valid[index] -- bool-массив (M,): у клеток с меньшим числом отрезков хвост заполнен самой клеткой и valid = False
+        """
+        if self._window_table is None:
+            windows_count = max(len(cell_windows) for cell_windows in self.windows_through_cell)
+            cells = np.empty((self.cells_count, windows_count, self.streak), dtype=np.int32)
+            cells[:] = np.arange(self.cells_count, dtype=np.int32)[:, None, None]
+            valid = np.zeros((self.cells_count, windows_count), dtype=bool)
+            filled = [0] * self.cells_count
+            for window in self.windows:
+                for index in window:
+                    cells[index, filled[index]] = window
+                    valid[index, filled[index]] = True
+                    filled[index] += 1
+            self._window_table = (cells, valid)
+        return self._window_table
+
+    def is_winning_move(self, index: int, occupied: int, feature_masks) -> bool:
+        """
+        Проверяет, образует ли фигура в клетке index выигрышный отрезок:
+        все клетки отрезка заняты и по какому-то свойству у всех фигур одинаковый разряд
+        """
+        for start, pattern in self.windows_through_cell[index]:
+            if (occupied >> start) & pattern != pattern:
+                continue
+            for mask in feature_masks:
+                common = (mask >> start) & pattern
+                if not common or common == pattern:
+                    return True
+        return False
@@ -0,0 +1,136 @@
+from app.basic_game_core.geometry import Geometry
+from app.basic_game_core.player import Player
+import random
+
+PLAYERS = (Player.Type.CROSS, Player.Type.NAUGHT)  # по значению Player.Type
+
+
+def _collect_threats(
+    threats: list, start: int, pattern: int, taken: int, feature_masks: list[int]
+) -> None:
+    """
+    Дописывает в threats угрозы отрезка (start, pattern), в котором заняты клетки taken и свободна одна:
+    (свободная клетка, k, b) для каждого разряда k, общего у всех фигур отрезка и равного b
+    """
+    cell = start + (pattern ^ taken).bit_length() - 1
+    for k, mask in enumerate(feature_masks):
+        common = (mask >> start) & taken
+        if not common:
+            threats.append((cell, k, 0))
+        if common == taken:
+            threats.append((cell, k, 1))
+
+
+def threat_rollout(
+    geometry: Geometry,
+    occupied: int,
+    feature_masks: list[int],
+    available_figures_mask: int,
+    who: int,
+    cells: list[int],
+    moves: list[int] = None,
+) -> Player.Type:
+    """
+    Доигрывание с угрозами: ходящий выигрывает сразу, если может закончить отрезок; иначе занимает клетку,
+    которой соперник закончил бы отрезок следующим ходом; иначе ходит в случайную свободную клетку.
+
+    Угроза -- отрезок, в котором занято STREAK_TO_WIN - 1 клеток и у всех их фигур k-й разряд равен b:
+    свободную клетку отрезка выигрывает любая фигура с тем же разрядом. Угрозы собираются один раз
+    по всем отрезкам, дальше -- только по отрезкам через клетку очередного хода. Разряды занятых клеток
+    не меняются, так что список угроз точен, а отрезок может закончить только ход в клетку угрозы:
+    проверка победы после хода не нужна, и шаг дороже случайного лишь на просмотр живых угроз.
+
+    Позиция задаётся масками, как у BitBoard (feature_masks меняется на месте), who -- номер ходящего
+    (Player.Type.value), cells -- свободные клетки. Возвращает победителя (Player.Type.NONE -- ничья);
+    партия, в которой у ходящего кончились фигуры, -- ничья. moves -- если передан, в него дописываются
+    номера действий сделанных ходов (см. Geometry.encode_action)
+    """
+    d = geometry.count_features
+    streak_minus_one = geometry.streak - 1
+    windows_through_cell = geometry.windows_through_cell
+    action_offset = geometry.action_offset
+    random.shuffle(cells)
+
+    figures = None
+    if d > 1:
+        count_different_figures = geometry.count_different_figures
+        figures = []
+        for player in range(2):
+            player_figures = [
+                figure
+                for figure in range(
+                    player * count_different_figures,
+                    (player + 1) * count_different_figures,
+                )
+                if (available_figures_mask >> figure) & 1
+            ]
+            random.shuffle(player_figures)
+            figures.append(player_figures)
+
+    def fitting_figure(player: int, k: int, bit: int) -> int:
+        """
+        Фигура игрока player с k-м разрядом bit или -1, если такой нет
+        """
+        if figures is None:
+            return player if bit == player else -1  # единственный разряд -- разряд игрока
+        for figure in figures[player]:
+            if (figure >> (d - 1 - k)) & 1 == bit:
+                return figure
+        return -1
+
+    threats = []  # (клетка, разряд, значение разряда)
+    for start, pattern in geometry.window_masks:
+        taken = (occupied >> start) & pattern
+        if taken.bit_count() == streak_minus_one:
+            _collect_threats(threats, start, pattern, taken, feature_masks)
+
+    free_count = len(cells)
+    next_cell = 0
+    while free_count:
+        block = -1
+        live_threats = []
+        for threat in threats:
+            cell, k, bit = threat
+            if (occupied >> cell) & 1:
+                continue
+            live_threats.append(threat)
+            figure = fitting_figure(who, k, bit)
+            if figure != -1:
+                if moves is not None:
+                    moves.append(action_offset[figure] + cell)
+                return PLAYERS[who]
+            if block == -1 and fitting_figure(who ^ 1, k, bit) != -1:
+                block = cell
+        threats = live_threats
+
+        if block != -1:
+            index = block
+        else:
+            while (occupied >> cells[next_cell]) & 1:
+                next_cell += 1
+            index = cells[next_cell]
+
+        bit = 1 << index
+        occupied |= bit
+        if figures is None:
+            figure = who
+            if who:
+                feature_masks[0] |= bit
+        else:
+            if not figures[who]:
+                return Player.Type.NONE
+            figure = figures[who].pop()
+            for k in range(d):
+                if (figure >> (d - 1 - k)) & 1:
+                    feature_masks[k] |= bit
+        if moves is not None:
+            moves.append(action_offset[figure] + index)
+        free_count -= 1
+
+        for start, pattern in windows_through_cell[index]:
+            taken = (occupied >> start) & pattern
+            if taken.bit_count() == streak_minus_one:
+                _collect_threats(threats, start, pattern, taken, feature_masks)
+        who ^= 1
+
+    return Player.Type.NONE
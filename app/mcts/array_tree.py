@@ -0,0 +1,455 @@
+import numpy as np
+import sys
+
+INITIAL_CAPACITY = 1 << 10
+
+
+def puct_select(
+    estimate: np.ndarray,
+    prior: np.ndarray,
+    visits: np.ndarray,
+    parent_visits: int,
+    puct_constant: float,
+) -> int:
+    """
+    Номер ребёнка с наибольшим Q + U одним векторным вычислением по массивам детей узла.
+    Формула и порядок операций те же, что и в TreeNode.get_node_value, а argmax, как и max,
+    берёт первый из равных -- при одинаковой статистике выбор совпадает с TreeNode.select_action
+    """
+    scores = puct_constant * prior * np.sqrt(parent_visits) / (1 + visits)
+    scores += estimate
+    return int(np.argmax(scores))
+
+
+class ArrayTree:
+    """
+    Дерево поиска в виде структуры массивов. Узел -- целый индекс, корень -- индекс root.
+
+    visits[i] -- число посещений узла
+    value_sum[i] -- сумма значений, пришедших в узел
+    estimate[i] -- оценка узла Q, средняя по посещениям (считается так же, как TreeNode._estimate_value)
+    prior[i] -- априорная вероятность хода в узел
+    parent[i] -- индекс родителя (-1 у корня)
+    first_child[i], children_count[i] -- дети узла лежат подряд: first_child .. first_child + children_count - 1
+    children_capacity[i] -- место, отведённое детям узла при раскрытии: при прогрессивном расширении за детьми
+        лежат ещё не добавленные ходы (действие и вероятность уже записаны), children_count растёт до него
+    action[i] -- номер действия, которым пришли в узел (см. Geometry.encode_action)
+    virtual_loss[i] -- виртуальные потери от незавершённых плейаутов параллельного поиска
+    canonical[i] -- узел, в котором хранится статистика позиции узла i (сам i, если позиция не транспозиция)
+    proven[i] -- доказанный исход хода в узел для сделавшего его: 1 -- выигрыш, -1 -- проигрыш, 0 -- не доказан
+    amaf_visits[i], amaf_estimate[i] -- RAVE (AMAF): сколько плейаутов из родителя сделали ход узла
+        в любой момент (не только первым) и средний их результат для сделавшего ход
+
+    Массивы выделяются с запасом и удваиваются при нехватке места. move_root переносит поддерево
+    нового корня в начало массивов, остальное дерево освобождается.
+    virtual_loss_paths -- число путей, на которых сейчас лежат виртуальные потери.
+    pending_children -- число ещё не добавленных ходов во всём дереве (они не считаются узлами).
+
+    transpositions -- таблица транспозиций (ключ позиции -> узел) или None, если она выключена.
+    Узел позиции, уже встречавшейся в дереве под другим узлом, становится ссылкой на него (canonical),
+    и поиск идёт по графу: детей узла выбирают по статистике их canonical-узлов
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY, transpositions: bool = False):
+        self.transpositions: dict[int, int] = {} if transpositions else None
+        self._allocate(capacity)
+        self.reset()
+
+    def _allocate(self, capacity: int) -> None:
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.estimate = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.children_count = np.zeros(capacity, dtype=np.int32)
+        self.children_capacity = np.zeros(capacity, dtype=np.int32)
+        self.action = np.full(capacity, -1, dtype=np.int32)
+        self.virtual_loss = np.zeros(capacity, dtype=np.int32)
+        self.canonical = np.full(capacity, -1, dtype=np.int32)
+        self.proven = np.zeros(capacity, dtype=np.int8)
+        self.amaf_visits = np.zeros(capacity, dtype=np.int64)
+        self.amaf_estimate = np.zeros(capacity, dtype=np.float64)
+
+    def _arrays(self) -> list[np.ndarray]:
+        return [
+            self.visits,
+            self.value_sum,
+            self.estimate,
+            self.prior,
+            self.parent,
+            self.first_child,
+            self.children_count,
+            self.children_capacity,
+            self.action,
+            self.virtual_loss,
+            self.canonical,
+            self.proven,
+            self.amaf_visits,
+            self.amaf_estimate,
+        ]
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self.visits)
+        if self.size + count <= capacity:
+            return
+        while capacity < self.size + count:
+            capacity *= 2
+        old_arrays = self._arrays()
+        self._allocate(capacity)
+        for new, old in zip(self._arrays(), old_arrays):
+            new[: self.size] = old[: self.size]
+
+    def _clear(self, start: int, stop: int) -> None:
+        self.visits[start:stop] = 0
+        self.value_sum[start:stop] = 0.0
+        self.estimate[start:stop] = 0.0
+        self.prior[start:stop] = 0.0
+        self.parent[start:stop] = -1
+        self.first_child[start:stop] = -1
+        self.children_count[start:stop] = 0
+        self.children_capacity[start:stop] = 0
+        self.action[start:stop] = -1
+        self.virtual_loss[start:stop] = 0
+        self.canonical[start:stop] = -1
+        self.proven[start:stop] = 0
+        self.amaf_visits[start:stop] = 0
+        self.amaf_estimate[start:stop] = 0.0
+
+    def reset(self, action: int = -1) -> None:
+        self.size = 1
+        self._clear(0, len(self.visits))
+        self.prior[0] = 1.0
+        self.action[0] = action
+        self.canonical[0] = 0
+        self.root = 0
+        self.virtual_loss_paths = 0
+        self.pending_children = 0
+        if self.transpositions is not None:
+            self.transpositions = {}
+
+    def is_leaf(self, node: int) -> bool:
+        return self.children_count[node] == 0
+
+    def select_child(
+        self,
+        node: int,
+        puct_constant: float,
+        rave_equivalence: float = 0.0,
+        max_children: int = 0,
+    ) -> tuple[int, int]:
+        """
+        Ребёнок с наибольшим Q + U, U = puct_constant * prior * sqrt(N_parent) / (1 + N_child) (см. puct_select).
+        Пока на дереве есть виртуальные потери, каждая их единица считается посещением с проигрышем (значением -1).
+        rave_equivalence > 0 -- RAVE: Q смешивается с AMAF-оценкой, (1 - beta) * Q + beta * Q_amaf,
+        beta = sqrt(rave_equivalence / (3 * N_child + rave_equivalence)).
+        Доказанные дети не выбираются, пока есть недоказанные.
+        max_children > 0 -- прогрессивное расширение: если детей меньше max_children, добавляются
+        следующие по порядку раскрытия ходы из отведённого места
+        """
+        start = int(self.first_child[node])
+        count = int(self.children_count[node])
+        if max_children > count and self.children_capacity[node] > count:
+            added = min(max_children, int(self.children_capacity[node])) - count
+            count += added
+            self.children_count[node] = count
+            self.pending_children -= added
+        stop = start + count
+        # статистика детей -- в их canonical-узлах (без таблицы транспозиций это сами дети)
+        children = slice(start, stop) if self.transpositions is None else self.canonical[start:stop]
+        if self.virtual_loss_paths:
+            virtual_loss = self.virtual_loss[children]
+            visits = self.visits[children] + virtual_loss
+            estimate = (self.estimate[children] * self.visits[children] - virtual_loss) / np.maximum(
+                visits, 1
+            )
+            parent_visits = self.visits[node] + self.virtual_loss[node]
+        else:
+            visits = self.visits[children]
+            estimate = self.estimate[children]
+            parent_visits = self.visits[node]
+        if rave_equivalence:
+            beta = np.sqrt(rave_equivalence / (3 * visits + rave_equivalence))
+            estimate = estimate + beta * (self.amaf_estimate[children] - estimate)
+        child = start + puct_select(
+            np.where(self.proven[children] != 0, -np.inf, estimate),
+            self.prior[start:stop],
+            visits,
+            parent_visits,
+            puct_constant,
+        )
+        return int(self.action[child]), int(self.canonical[child])
+
+    def expand(self, node: int, actions_with_prior_probabilities, max_children: int = 0) -> None:
+        """
+        Раскрывает лист node ходами actions_with_prior_probabilities.
+        max_children > 0 -- прогрессивное расширение: детьми становятся первые max_children ходов,
+        место под остальные отводится сразу, и select_child добавляет их по мере роста посещений
+        """
+        if self.children_count[node]:
+            return
+        actions, probabilities = [], []
+        for action, probability in actions_with_prior_probabilities:
+            actions.append(action)
+            probabilities.append(probability)
+        count = len(actions)
+        if not count:
+            return
+        self._reserve(count)
+        start = self.size
+        stop = start + count
+        self.action[start:stop] = actions
+        self.prior[start:stop] = probabilities
+        self.parent[start:stop] = node
+        self.canonical[start:stop] = np.arange(start, stop)
+        self.first_child[node] = start
+        self.children_capacity[node] = count
+        self.children_count[node] = min(count, max_children) if max_children else count
+        self.pending_children += count - int(self.children_count[node])
+        self.size = stop
+
+    def backup(self, path: list[int], leaf_value: float) -> None:
+        """
+        Обновляет узлы пути выбора path (от корня до листа) одним векторным шагом:
+        лист -- значением leaf_value, каждый узел выше -- со сменой знака
+        """
+        nodes = np.array(path)
+        values = np.full(len(path), leaf_value, dtype=np.float64)
+        values[-2::-2] = -leaf_value
+        self.visits[nodes] += 1
+        self.value_sum[nodes] += values
+        self.estimate[nodes] += (values - self.estimate[nodes]) / self.visits[nodes]
+
+    def backup_amaf(self, path: list[int], actions: list[int], leaf_value: float) -> None:
+        """
+        RAVE: actions -- все ходы плейаута, len(path) - 1 ходов по дереву и затем ходы доигрывания.
+        У каждого узла пути path[i] дети, чьи действия ходящий в path[i] сделал на глубине i или позже,
+        получают в AMAF-статистику результат плейаута для него -- то же значение, что backup даёт path[i + 1]
+        """
+        actions = np.asarray(actions)
+        depth_value = leaf_value  # значение узла path[depth + 1]
+        for depth in range(len(path) - 2, -1, -1):
+            node = path[depth]
+            start = int(self.first_child[node])
+            stop = start + int(self.children_count[node])
+            played = np.isin(self.action[start:stop], actions[depth::2])
+            children = np.arange(start, stop)[played]
+            if self.transpositions is not None:
+                children = self.canonical[children]
+            self.amaf_visits[children] += 1
+            self.amaf_estimate[children] += (
+                depth_value - self.amaf_estimate[children]
+            ) / self.amaf_visits[children]
+            depth_value = -depth_value
+
+    def prove(self, path: list[int], proven: int, all_moves_expanded: bool = True) -> None:
+        """
+        MCTS-Solver: лист пути path получает доказанный исход proven (1 -- ход в него выигрывает, -1 -- проигрывает),
+        и доказательство поднимается к корню: узел с выигрышным ходом проигран для пришедшего в него,
+        узел, все ходы из которого проигрывают, -- выигран. Подъём останавливается на первом недоказанном узле.
+        all_moves_expanded=False -- дети узлов раскрыты не по всем допустимым ходам (кандидаты ограничены):
+        нераскрытый ход может спасти, и выигрыш по проигрышу всех детей не доказывается.
+        То же для узла, у которого прогрессивное расширение добавило ещё не все ходы
+        """
+        self.proven[path[-1]] = proven
+        for depth in range(len(path) - 1, 0, -1):
+            node, parent = path[depth], path[depth - 1]
+            if self.proven[node] == 1:
+                self.proven[parent] = -1
+                continue
+            count = int(self.children_count[parent])
+            if not all_moves_expanded or count < self.children_capacity[parent]:
+                break
+            start = int(self.first_child[parent])
+            stop = start + count
+            children = slice(start, stop) if self.transpositions is None else self.canonical[start:stop]
+            if not np.all(self.proven[children] == -1):
+                break
+            self.proven[parent] = 1
+
+    def find_transposition(self, parent: int, action: int, node: int, key: int) -> int:
+        """
+        Узел позиции с ключом key, в которую пришли из parent действием action в лист node.
+        Если позиция уже есть в дереве под другим узлом, node становится ссылкой на него и возвращается тот узел,
+        иначе node запоминается в таблице транспозиций и возвращается сам
+        """
+        canonical = self.transpositions.setdefault(key, node)
+        self.canonical[node] = canonical
+        return canonical
+
+    def add_virtual_loss(self, path: list[int], amount: int) -> None:
+        """
+        Виртуальная потеря amount на узлах пути path: пока плейаут по нему не закончен,
+        другие потоки поиска реже выбирают этот путь
+        """
+        self.virtual_loss[path] += amount
+        self.virtual_loss_paths += 1
+
+    def remove_virtual_loss(self, path: list[int], amount: int) -> None:
+        self.virtual_loss[path] -= amount
+        self.virtual_loss_paths -= 1
+
+    def children(self, node: int) -> list[tuple[int, int]]:
+        start = int(self.first_child[node])
+        return [
+            (int(self.action[child]), int(self.canonical[child]))
+            for child in range(start, start + int(self.children_count[node]))
+        ]
+
+    def best_two_visits(self, node: int) -> tuple[int, int]:
+        """
+        Два наибольших числа посещений среди детей node; второе -- None, если ребёнок один (или детей нет)
+        """
+        start = int(self.first_child[node])
+        stop = start + int(self.children_count[node])
+        children = slice(start, stop) if self.transpositions is None else self.canonical[start:stop]
+        visits = self.visits[children]
+        if len(visits) < 2:
+            return (int(visits[0]) if len(visits) else 0), None
+        second, best = np.partition(visits, len(visits) - 2)[-2:]
+        return int(best), int(second)
+
+    def visit_count(self, node: int) -> int:
+        return int(self.visits[node])
+
+    def value(self, node: int) -> float:
+        return float(self.estimate[node])
+
+    def prior_probability(self, node: int) -> float:
+        return float(self.prior[node])
+
+    def proven_outcome(self, node: int) -> int:
+        return int(self.proven[node])
+
+    def pending_virtual_loss(self, node: int) -> int:
+        return int(self.virtual_loss[node])
+
+    def move_root(self, action: int) -> None:
+        """
+        Делает корнем ребёнка по действию action: его поддерево переносится в начало массивов
+        (в порядке обхода в ширину, дети каждого узла остаются подряд). Если такого ребёнка нет -- новый корень.
+        Ссылки на узлы вне перенесённого поддерева и их записи в таблице транспозиций отбрасываются
+        """
+        new_root = -1
+        for child_action, child in self.children(self.root):
+            if child_action == action:
+                new_root = child
+                break
+        if new_root == -1:
+            self.reset(action)
+            return
+        self._compact(new_root)
+
+    def prune(self, target_nodes: int) -> None:
+        """
+        Сворачивает в листья узлы с наименьшим числом посещений (их поддеревья удаляются, статистика
+        самих узлов остаётся, кроме доказанного исхода), пока в дереве не останется не больше target_nodes узлов.
+        Дети корня не удаляются. Освободившееся место в массивах переиспользуется
+        """
+        if self.nodes_count() <= target_nodes:
+            return
+        root = self.root
+        # раскрытые узлы по убыванию приоритета -- посещений, ограниченных посещениями всех предков:
+        # с транспозициями canonical-узел собирает посещения нескольких родителей, и его посещений может быть
+        # больше, чем у родителя. Приоритет ребёнка не больше приоритета родителя, а индекс больше --
+        # родители идут раньше детей, и оставленные узлы образуют поддерево корня
+        parent = self.parent[: self.size]
+        has_parent = np.flatnonzero(parent >= 0)
+        priority = self.visits[: self.size].copy()
+        while True:  # без транспозиций -- один проход: посещения уже не растут вниз по дереву
+            capped = np.minimum(priority[has_parent], priority[parent[has_parent]])
+            if np.array_equal(capped, priority[has_parent]):
+                break
+            priority[has_parent] = capped
+        expanded = np.flatnonzero(self.children_count[: self.size])
+        expanded = expanded[expanded != root]
+        expanded = expanded[np.lexsort((expanded, -priority[expanded]))]
+        kept_children = np.cumsum(self.children_count[expanded])
+        kept_below_root = target_nodes - 1 - int(self.children_count[root])
+        keep_children = np.zeros(len(self.visits), dtype=bool)
+        keep_children[expanded[kept_children <= kept_below_root]] = True
+        self._compact(root, keep_children)
+
+    def _compact(self, new_root: int, keep_children: np.ndarray = None) -> None:
+        """
+        Переносит поддерево new_root в начало массивов в порядке обхода в ширину.
+        keep_children -- bool-маска узлов, чьи дети переносятся (new_root -- всегда); остальные становятся листьями.
+        Вместе с детьми переносится и место под ещё не добавленные ходы
+        """
+        # order[i] -- старый индекс узла, который встанет на место i
+        order = [new_root]
+        new_first_child = [-1]
+        head = 0
+        while head < len(order):
+            node = order[head]
+            count = int(self.children_count[node])
+            if count and (head == 0 or keep_children is None or keep_children[node]):
+                new_first_child[head] = len(order)
+                start = int(self.first_child[node])
+                capacity = int(self.children_capacity[node])
+                order.extend(range(start, start + capacity))
+                new_first_child.extend([-1] * capacity)
+            head += 1
+
+        order = np.array(order, dtype=np.int64)
+        position = np.empty(len(self.visits), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        size = len(order)
+
+        self.visits[:size] = self.visits[order]
+        self.value_sum[:size] = self.value_sum[order]
+        self.estimate[:size] = self.estimate[order]
+        self.prior[:size] = self.prior[order]
+        new_first_child = np.array(new_first_child, dtype=np.int32)
+        # свёрнутый в лист узел теряет и доказанный исход: иначе он стал бы доказанным листом без детей
+        collapsed = (new_first_child < 0) & (self.children_count[order] > 0)
+        self.children_count[:size] = np.where(
+            new_first_child >= 0, self.children_count[order], 0
+        )
+        self.children_capacity[:size] = np.where(
+            new_first_child >= 0, self.children_capacity[order], 0
+        )
+        self.pending_children = int(
+            self.children_capacity[:size].sum() - self.children_count[:size].sum()
+        )
+        self.action[:size] = self.action[order]
+        self.virtual_loss[:size] = self.virtual_loss[order]
+        self.proven[:size] = np.where(collapsed, 0, self.proven[order])
+        self.amaf_visits[:size] = self.amaf_visits[order]
+        self.amaf_estimate[:size] = self.amaf_estimate[order]
+        if self.transpositions is not None:
+            kept = np.zeros(len(self.visits), dtype=bool)
+            kept[order] = True
+            canonical = self.canonical[order]
+            self.canonical[:size] = np.where(
+                kept[canonical], position[canonical], np.arange(size)
+            )
+            self.transpositions = {
+                key: int(position[node])
+                for key, node in self.transpositions.items()
+                if kept[node]
+            }
+        else:
+            self.canonical[:size] = np.arange(size)
+        self.parent[:size] = np.where(
+            self.parent[order] >= 0, position[np.maximum(self.parent[order], 0)], -1
+        )
+        self.parent[0] = -1
+        self.first_child[:size] = new_first_child
+        self._clear(size, self.size)
+        self.size = size
+        self.root = 0
+
+    def nodes_count(self) -> int:
+        return self.size - self.pending_children
+
+    def memory_bytes(self) -> int:
+        """
+        Память дерева: выделенные массивы (вместе с запасом) и таблица транспозиций
+        """
+        memory = sum(array.nbytes for array in self._arrays())
+        if self.transpositions is not None:
+            memory += sys.getsizeof(self.transpositions) + sum(
+                sys.getsizeof(key) for key in self.transpositions
+            )
+        return memory
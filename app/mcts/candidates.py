@@ -0,0 +1,77 @@
+import math
+import numpy as np
+
+# дальше этого расстояния от занятых клеток ходы при упорядочивании по расстоянию не различаются
+DISTANCE_ORDER_LIMIT = 4
+
+
+def stone_distances(board, limit: int) -> np.ndarray:
+    """
+    Расстояние Чебышёва от каждой клетки доски board до ближайшей занятой (массив длины HEIGHT * WIDTH);
+    клетки дальше limit получают limit + 1. На пустом поле расстояние считается до центральной клетки
+    (на поле чётного размера -- до центральных клеток). Окрестность наращивается сдвигами на одну клетку
+    по вертикали и горизонтали -- limit шагов по всему полю
+    """
+    height, width = board.geometry.height, board.geometry.width
+    # поле с рамкой из пустых клеток: сдвиги на клетку -- срезы без проверки границ
+    padded = np.zeros((height + 2, width + 2), dtype=bool)
+    near = padded[1:-1, 1:-1]
+    near[:] = ~board.free_cells_plane().reshape(height, width)
+    if not near.any():
+        near[(height - 1) // 2 : height // 2 + 1, (width - 1) // 2 : width // 2 + 1] = True
+    # клетка на расстоянии d покрыта на шагах d .. limit: расстояние -- limit + 1 минус число покрытий
+    covered = near.astype(np.int32)
+    for _ in range(limit):
+        rows = padded[:-2] | padded[1:-1] | padded[2:]
+        near[:] = rows[:, :-2] | rows[:, 1:-1] | rows[:, 2:]
+        covered += near
+    return (limit + 1 - covered).reshape(-1)
+
+
+def candidate_moves(
+    board, actions_with_probs, radius: int = 0, order: str = None
+) -> list[tuple[int, float]]:
+    """
+    Ходы для раскрытия узла с позицией board из actions_with_probs [(действие, вероятность), ...].
+    radius > 0 -- только ходы в клетки на расстоянии Чебышёва не больше radius от занятых
+    (на пустом поле -- от центра), вероятности оставшихся ходов нормируются заново;
+    если таких ходов нет, остаются все.
+    order -- порядок ходов для прогрессивного расширения (см. widening_limit): "prior" -- по убыванию
+    вероятности, "distance" -- по расстоянию до занятых клеток, равные -- в случайном порядке;
+    None -- порядок actions_with_probs
+    """
+    actions_with_probs = list(actions_with_probs)
+    if not actions_with_probs:
+        return actions_with_probs
+    actions, probs = zip(*actions_with_probs)
+    actions = np.array(actions)
+    probs = np.array(probs, dtype=np.float64)
+
+    distances = None
+    if radius or order == "distance":
+        limit = max(radius, DISTANCE_ORDER_LIMIT if order == "distance" else 0)
+        distances = stone_distances(board, limit)[actions % board.geometry.cells_count]
+    if radius:
+        near = distances <= radius
+        if near.any() and not near.all():
+            actions, probs, distances = actions[near], probs[near], distances[near]
+            total = probs.sum()
+            if total > 0:
+                probs /= total
+
+    if order == "prior":
+        permutation = np.argsort(-probs, kind="stable")
+    elif order == "distance":
+        permutation = np.lexsort((np.random.random(len(actions)), distances))
+    else:
+        return list(zip(actions.tolist(), probs.tolist()))
+    return list(zip(actions[permutation].tolist(), probs[permutation].tolist()))
+
+
+def widening_limit(visits: int, widening: float, exponent: float) -> int:
+    """
+    Прогрессивное расширение: у узла с visits посещениями ceil(widening * visits ** exponent) детей
+    (не меньше одного); ходы упорядочены при раскрытии (см. candidate_moves), и с посещениями
+    в дети добавляются следующие по порядку
+    """
+    return max(1, math.ceil(widening * visits**exponent))
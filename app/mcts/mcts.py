@@ -1,86 +1,558 @@
+from app.basic_game_core.config.game_config import (
+    MCTS_WORKERS,
+    MCTS_PLAYOUTS_PER_WORKER,
+    MCTS_THREADS,
+    MCTS_VIRTUAL_LOSS,
+    MCTS_TIME_BUDGET,
+    MCTS_NODE_BUDGET,
+    MCTS_PONDER,
+    MCTS_PONDER_NODE_BUDGET,
+    MCTS_MAX_TREE_NODES,
+    MCTS_EARLY_STOP,
+    MCTS_SOLVER,
+    MCTS_ROLLOUT,
+    MCTS_RAVE,
+    MCTS_RAVE_EQUIVALENCE,
+    MCTS_CANDIDATE_RADIUS,
+    MCTS_WIDENING,
+    MCTS_WIDENING_EXPONENT,
+)
 from app.basic_game_core.field import Field, GameStates
-from app.basic_game_core.node import Node
+from app.basic_game_core.geometry import Geometry
+from app.basic_game_core.node import new_board, get_game_state, define_winner
 from app.basic_game_core.player import Player
+from app.mcts.candidates import candidate_moves, widening_limit
+from app.mcts.search_tree import new_tree
+from app.mcts.search_budget import SearchStats, run_playouts
 
 # from app.system import measure_mcts_performance
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
 import numpy as np
+import os
+import random
+import sys
+import threading
+import time
 
+# пулы процессов для параллельного по корню поиска: число процессов -> пул (общие для всех игроков)
+_worker_pools: dict[int, ProcessPoolExecutor] = {}
 
-def rollout_policy_function(node: Node) -> list[tuple[Field.Cell, float]]:
-    available_moves = node.get_available_moves()
-    move_probabilities = np.random.rand(len(available_moves))  # random rollout
-    return zip(available_moves, move_probabilities)
+# политики доигрывания: имя -> метод доски
+ROLLOUT_POLICIES = {"random": "random_rollout", "threat": "threat_rollout"}
 
 
-def policy_value_function(node: Node) -> list[tuple[Field.Cell, float]]:
-    available_moves = node.get_available_moves()
-    action_probs = np.ones(len(available_moves)) / len(available_moves)
-    return zip(available_moves, action_probs)
+def policy_value_function(board) -> list[tuple[int, float]]:
+    legal_moves_count = board.legal_moves_count
+    action_probs = np.ones(legal_moves_count) / legal_moves_count
+    return zip(board.legal_actions(), action_probs)
+
+
+def run_root_search(
+    geometry_key: tuple[int, int, int, int],
+    moves: list[Field.Cell],
+    puct_constant: float,
+    playout_number: int,
+    tree_storage: str,
+    seed: int,
+    time_budget: float = None,
+    node_budget: int = None,
+    transpositions: bool = None,
+    max_tree_nodes: int = None,
+    solver: bool = None,
+    rollout_policy: str = None,
+    rave: bool = None,
+    rave_equivalence: float = None,
+    candidate_radius: int = None,
+    widening: float = None,
+    widening_exponent: float = None,
+) -> tuple[list[tuple[int, int, float, int]], SearchStats]:
+    """
+    Независимый поиск в процессе-исполнителе: позиция восстанавливается ходами moves от начальной.
+    Возвращает статистику детей корня [(действие, посещения, сумма значений, доказанный исход), ...]
+    и итог поиска
+    """
+    random.seed(seed)
+    np.random.seed(seed % (1 << 32))
+    mcts = MCTS(
+        policy_value_function,
+        puct_constant,
+        playout_number,
+        Geometry.get(*geometry_key),
+        tree_storage,
+        threads=1,
+        transpositions=transpositions,
+        max_tree_nodes=max_tree_nodes,
+        early_stop=False,  # отрыв в одном процессе не решает ход: посещения процессов складываются
+        solver=solver,
+        rollout_policy=rollout_policy,
+        rave=rave,
+        rave_equivalence=rave_equivalence,
+        candidate_radius=candidate_radius,
+        widening=widening,
+        widening_exponent=widening_exponent,
+    )
+    for move in moves:
+        mcts.move_and_update(move)
+    mcts._run_playouts(time_budget, node_budget)
+
+    tree = mcts._tree
+    return [
+        (
+            action,
+            tree.visit_count(node),
+            tree.visit_count(node) * tree.value(node),
+            tree.proven_outcome(node),
+        )
+        for action, node in tree.children(tree.root)
+    ], mcts.last_search
 
 
 class MCTS:
 
-    def __init__(self, policy_value_function, puct_constant, playout_number):
-        self._root: Node = Node()
+    def __init__(
+        self,
+        policy_value_function,
+        puct_constant,
+        playout_number,
+        geometry: Geometry = None,
+        tree_storage: str = None,
+        workers: int = None,
+        playouts_per_worker: int = None,
+        threads: int = None,
+        virtual_loss: int = None,
+        time_budget: float = None,
+        node_budget: int = None,
+        ponder: bool = None,
+        transpositions: bool = None,
+        max_tree_nodes: int = None,
+        early_stop: bool = None,
+        solver: bool = None,
+        rollout_policy: str = None,
+        rave: bool = None,
+        rave_equivalence: float = None,
+        candidate_radius: int = None,
+        widening: float = None,
+        widening_exponent: float = None,
+    ):
+        self._geometry: Geometry = (
+            geometry if geometry is not None else Geometry.current()
+        )
+        self._tree_storage = tree_storage
+        self._transpositions = transpositions
+        # ObjectTree или ArrayTree (с таблицей транспозиций -- граф позиций), см. app.mcts.search_tree
+        self._tree = new_tree(tree_storage, transpositions)
+        self._board = new_board(self._geometry)  # позиция корня; во время плейаута -- позиция текущего узла
+        self._moves: list[Field.Cell] = []  # ходы от начальной позиции до корня
         self._policy_value_function = policy_value_function
         self._puct_constant: float = puct_constant
         self._playout_number: int = playout_number
+        self._workers: int = workers if workers is not None else MCTS_WORKERS
+        self._playouts_per_worker: int = (
+            playouts_per_worker
+            if playouts_per_worker is not None
+            else MCTS_PLAYOUTS_PER_WORKER
+        ) or -(-playout_number // self._workers)
+        self._threads: int = threads if threads is not None else MCTS_THREADS
+        # в однопоточном поиске блокировка и виртуальные потери не нужны
+        self._virtual_loss: int = (
+            (virtual_loss if virtual_loss is not None else MCTS_VIRTUAL_LOSS)
+            if self._threads > 1
+            else 0
+        )
+        self._tree_lock = (
+            threading.Lock() if self._threads > 1 else contextlib.nullcontext()
+        )
+        self._time_budget: float = (
+            time_budget if time_budget is not None else MCTS_TIME_BUDGET
+        )
+        self._node_budget: int = node_budget if node_budget is not None else MCTS_NODE_BUDGET
+        self._max_tree_nodes: int = (
+            max_tree_nodes if max_tree_nodes is not None else MCTS_MAX_TREE_NODES
+        )
+        self._early_stop: bool = early_stop if early_stop is not None else MCTS_EARLY_STOP
+        self._solver: bool = solver if solver is not None else MCTS_SOLVER
+        self._rollout_policy: str = (
+            rollout_policy if rollout_policy is not None else MCTS_ROLLOUT
+        )
+        self._rollout_method: str = ROLLOUT_POLICIES[self._rollout_policy]
+        self._rave: bool = rave if rave is not None else MCTS_RAVE
+        # 0 -- без RAVE (см. tree.select_child)
+        self._rave_equivalence: float = (
+            (rave_equivalence if rave_equivalence is not None else MCTS_RAVE_EQUIVALENCE)
+            if self._rave
+            else 0.0
+        )
+        self._candidate_radius: int = (
+            candidate_radius if candidate_radius is not None else MCTS_CANDIDATE_RADIUS
+        )
+        # 0 -- без прогрессивного расширения (см. widening_limit)
+        self._widening: float = widening if widening is not None else MCTS_WIDENING
+        self._widening_exponent: float = (
+            widening_exponent if widening_exponent is not None else MCTS_WIDENING_EXPONENT
+        )
+        self.last_search: SearchStats = None  # итог последнего поиска (с памятью дерева после него)
+        self._ponder: bool = ponder if ponder is not None else MCTS_PONDER
+        self._ponder_thread: threading.Thread = None
+        self._ponder_stop = threading.Event()
+        self.last_ponder: SearchStats = None  # итог последнего обдумывания на времени соперника
 
-    def _run_playout(self) -> None:
-        node = self._root
-        while True:
-            if node.is_leaf():
-                break
-            action, node = node.select_action(self._puct_constant)
-
-        game_state = node.check_game_state()
-        if game_state == GameStates.CONTINUE:
-            node.expand_node(self._policy_value_function(node))
-        leaf_value = self._run_rollout(node)
-        node.update_all_ancestors_recursively(-leaf_value)
-
-    def _run_rollout(self, node: Node) -> int:
-        player = node.who_moves
-        while True:
-            game_state = node.check_game_state()
-            if game_state != GameStates.CONTINUE:
-                winner = node.define_winner(game_state)
-                break
-
-            action = max(rollout_policy_function(node), key=lambda action: action[1])[0]
-            node = Node(node, action)
+    def reset(self) -> None:
+        self.stop_pondering()
+        self._tree.reset()
+        self._board = new_board(self._geometry)
+        self._moves = []
+
+    def _run_playout(self, board=None) -> None:
+        """
+        Один плейаут на доске board (по умолчанию -- _board; потоки поиска передают свои копии).
+        Спуск и обновление дерева идут под _tree_lock, доигрывание -- без блокировки.
+        С _solver спуск останавливается в раскрытом узле с доказанным исходом, его значение известно без доигрывания,
+        а выигрыш в конце партии доказывается и поднимается по пути (tree.prove).
+        С RAVE (_rave) ходы по дереву и ходы доигрывания дают AMAF-статистику узлам пути (tree.backup_amaf).
+        С _candidate_radius раскрываются только ходы рядом с занятыми клетками, с прогрессивным расширением
+        (_widening) ходы упорядочены по расстоянию до занятых клеток и добавляются в дети по мере посещений узла
+        """
+        tree = self._tree
+        board = board if board is not None else self._board
+        with self._tree_lock:
+            node = tree.root
+            path = [node]  # путь выбора от корня до листа
+            actions = []  # ходы вдоль пути, с RAVE к ним дописываются ходы доигрывания
+            while True:
+                if tree.is_leaf(node):
+                    if tree.transpositions is None or len(path) == 1:
+                        break
+                    # позиция могла встретиться при другом порядке ходов -- тогда спуск продолжается из её узла
+                    node = tree.find_transposition(path[-2], action, node, board.zobrist)
+                    path[-1] = node
+                    if tree.is_leaf(node):
+                        break
+                if tree.proven_outcome(node):
+                    break
+                action, node = tree.select_child(
+                    node,
+                    self._puct_constant,
+                    self._rave_equivalence,
+                    widening_limit(
+                        tree.visit_count(node), self._widening, self._widening_exponent
+                    )
+                    if self._widening
+                    else 0,
+                )
+                board.push_action(action)
+                path.append(node)
+                actions.append(action)
+            if self._virtual_loss:
+                tree.add_virtual_loss(path, self._virtual_loss)
+            # лист оценивается заново, даже если доказан: это конец партии (исход подтвердится)
+            # или узел, свёрнутый tree.prune, -- его нужно раскрыть
+            proven = 0 if tree.is_leaf(node) else tree.proven_outcome(node)
+
+        actions_with_probs = None
+        if proven:
+            leaf_value = -proven
+        else:
+            game_state = get_game_state(board)
+            if game_state == GameStates.CONTINUE:
+                actions_with_probs = self._policy_value_function(board)
+                if self._candidate_radius or self._widening:
+                    actions_with_probs = candidate_moves(
+                        board,
+                        actions_with_probs,
+                        self._candidate_radius,
+                        "distance" if self._widening else None,
+                    )
+                leaf_value = self._run_rollout(board, actions if self._rave else None)
+            else:
+                winner = define_winner(game_state)
+                if winner == Player.Type.NONE:
+                    leaf_value = 0
+                else:
+                    leaf_value = 1 if winner == board.who_moves else -1
+                if self._solver and leaf_value == -1:  # ход в узел выиграл партию
+                    proven = 1
+
+        with self._tree_lock:
+            if actions_with_probs is not None:
+                tree.expand(
+                    node,
+                    actions_with_probs,
+                    widening_limit(
+                        tree.visit_count(node), self._widening, self._widening_exponent
+                    )
+                    if self._widening
+                    else 0,
+                )
+            if self._virtual_loss:
+                tree.remove_virtual_loss(path, self._virtual_loss)
+            tree.backup(path, -leaf_value)
+            if self._rave:
+                tree.backup_amaf(path, actions, -leaf_value)
+            if proven:
+                # с candidate_radius дети узла -- не обязательно все ходы: ход вне них может спасти,
+                # и выигрыш по проигрышу всех детей не доказывается (с widening дерево решает это
+                # само -- по тому, добавлены ли уже все ходы узла)
+                tree.prove(path, proven, not self._candidate_radius)
+
+        for _ in range(len(path) - 1):
+            board.pop()
+
+    def _run_rollout(self, board, moves: list[int] = None) -> int:
+        """
+        Доигрывание из позиции board политикой _rollout_policy (board.random_rollout или board.threat_rollout):
+        без узлов и копий доски. Возвращает результат с точки зрения ходящего в board.
+        moves -- если передан, в него дописываются номера действий ходов доигрывания
+        """
+        player = board.who_moves
+        winner = getattr(board, self._rollout_method)(moves)
 
         if winner == Player.Type.NONE:  # tie
             return 0
         else:
             return 1 if winner == player else -1
 
+    def _run_playouts(self, time_budget: float = None, node_budget: int = None) -> None:
+        """
+        Поиск до первого из пределов: _playout_number плейаутов, time_budget секунд, node_budget узлов
+        (по умолчанию -- _time_budget и _node_budget); итог -- в last_search
+        """
+        self.last_search = run_playouts(
+            self._run_playout,
+            self._board,
+            self._tree,
+            self._playout_number,
+            self._threads,
+            time_budget if time_budget is not None else self._time_budget,
+            node_budget if node_budget is not None else self._node_budget,
+            max_tree_nodes=self._max_tree_nodes,
+            early_stop=self._early_stop,
+            tree_lock=self._tree_lock,
+        )
+
+    def start_pondering(self) -> None:
+        """
+        Если включено обдумывание (_ponder), запускает фоновый поиск от текущего корня, пока думает соперник.
+        Поиск идёт до stop_pondering (его вызывают get_move, move_and_update и reset), ограничен
+        _node_budget (если он не задан -- MCTS_PONDER_NODE_BUDGET); накопленная статистика остаётся
+        в поддереве хода соперника. Итог -- в last_ponder.
+        При параллельном по корню поиске (_workers > 1) не работает: деревья процессов между ходами не хранятся
+        """
+        if not self._ponder or self._workers > 1 or self._ponder_thread is not None:
+            return
+        if get_game_state(self._board) != GameStates.CONTINUE:
+            return
+        self._ponder_stop.clear()
+        self._ponder_thread = threading.Thread(target=self._run_pondering, daemon=True)
+        self._ponder_thread.start()
+
+    def _run_pondering(self) -> None:
+        self.last_ponder = run_playouts(
+            self._run_playout,
+            self._board,
+            self._tree,
+            sys.maxsize,
+            self._threads,
+            node_budget=self._node_budget or MCTS_PONDER_NODE_BUDGET,
+            stop_event=self._ponder_stop,
+            max_tree_nodes=self._max_tree_nodes,
+            tree_lock=self._tree_lock,
+        )
+
+    def stop_pondering(self) -> None:
+        if self._ponder_thread is None:
+            return
+        self._ponder_stop.set()
+        self._ponder_thread.join()
+        self._ponder_thread = None
+
     # @measure_mcts_performance
-    def get_move(self) -> Field.Cell:
-        for _ in range(self._playout_number):
-            self._run_playout()
-        return max(
-            self._root._children.items(), key=lambda child: child[1]._visits_number
+    def get_move(self, time_budget: float = None, node_budget: int = None) -> Field.Cell:
+        """
+        Лучший ход после поиска, который останавливается на первом из пределов: _playout_number плейаутов,
+        time_budget секунд или node_budget узлов дерева (по умолчанию -- заданные в конструкторе).
+        Сколько плейаутов сделано и почему поиск остановлен -- в last_search
+        """
+        self.stop_pondering()
+        if self._workers > 1:
+            return self._get_move_root_parallel(time_budget, node_budget)
+
+        self._run_playouts(time_budget, node_budget)
+        # доказанный выигрыш -- сразу, доказанный проигрыш -- только если других ходов нет
+        action = max(
+            self._tree.children(self._tree.root),
+            key=lambda child: (
+                self._tree.proven_outcome(child[1]),
+                self._tree.visit_count(child[1]),
+            ),
         )[0]
+        return self._geometry.decode_action(action, self._board.who_moves)
+
+    def _get_move_root_parallel(
+        self, time_budget: float = None, node_budget: int = None
+    ) -> Field.Cell:
+        """
+        Параллельный по корню поиск: _workers независимых поисков из текущей позиции в отдельных
+        процессах с разными зёрнами, посещения и суммы значений детей корня складываются.
+        Выбирается ход с наибольшим суммарным числом посещений (при равенстве -- с большей суммой значений);
+        исход, доказанный любым процессом, важнее посещений: доказанный выигрыш выбирается сразу, проигрыш -- последним.
+        Пределы time_budget и node_budget действуют в каждом процессе отдельно, в last_search --
+        суммарные плейауты, узлы и память всех процессов
+        """
+        start_time = time.perf_counter()
+        if self._workers not in _worker_pools:
+            _worker_pools[self._workers] = ProcessPoolExecutor(self._workers)
+        pool = _worker_pools[self._workers]
+
+        geometry = self._geometry
+        geometry_key = (
+            geometry.height,
+            geometry.width,
+            geometry.streak,
+            geometry.count_features,
+        )
+        base_seed = int.from_bytes(os.urandom(4), "little")
+        futures = [
+            pool.submit(
+                run_root_search,
+                geometry_key,
+                self._moves,
+                self._puct_constant,
+                self._playouts_per_worker,
+                self._tree_storage,
+                base_seed + worker,
+                time_budget if time_budget is not None else self._time_budget,
+                node_budget if node_budget is not None else self._node_budget,
+                self._transpositions,
+                self._max_tree_nodes,
+                self._solver,
+                self._rollout_policy,
+                self._rave,
+                self._rave_equivalence,
+                self._candidate_radius,
+                self._widening,
+                self._widening_exponent,
+            )
+            for worker in range(self._workers)
+        ]
+
+        visits: dict[int, int] = {}
+        value_sums: dict[int, float] = {}
+        proven: dict[int, int] = {}
+        self.last_search = SearchStats()
+        for future in futures:
+            children, worker_search = future.result()
+            for action, action_visits, value_sum, action_proven in children:
+                visits[action] = visits.get(action, 0) + action_visits
+                value_sums[action] = value_sums.get(action, 0.0) + value_sum
+                proven[action] = proven.get(action, 0) or action_proven
+            self.last_search.playouts += worker_search.playouts
+            self.last_search.nodes_count += worker_search.nodes_count
+            self.last_search.memory_bytes += worker_search.memory_bytes
+            self.last_search.prunes += worker_search.prunes
+            self.last_search.saved_playouts += worker_search.saved_playouts
+            self.last_search.stop_reason = worker_search.stop_reason
+        self.last_search.elapsed_time = time.perf_counter() - start_time
+
+        action = max(
+            visits, key=lambda action: (proven[action], visits[action], value_sums[action])
+        )
+        return self._geometry.decode_action(action, self._board.who_moves)
 
     def move_and_update(self, move: Field.Cell) -> None:
-        if move in self._root._children:
-            self._root = self._root._children[move]
-        else:
-            self._root = Node(self._root, move)
-        self._root._parent = None
+        self.stop_pondering()
+        self._tree.move_root(self._geometry.encode_action(move))
+        self._board.push(move)
+        self._moves.append(move)
 
 
 class MCTSPlayer:
 
-    def __init__(self, puct_constant: float, playout_number: int):
-        self.mcts = MCTS(policy_value_function, puct_constant, playout_number)
+    def __init__(
+        self,
+        puct_constant: float,
+        playout_number: int,
+        geometry: Geometry = None,
+        tree_storage: str = None,
+        workers: int = None,
+        playouts_per_worker: int = None,
+        threads: int = None,
+        virtual_loss: int = None,
+        time_budget: float = None,
+        node_budget: int = None,
+        ponder: bool = None,
+        transpositions: bool = None,
+        max_tree_nodes: int = None,
+        early_stop: bool = None,
+        solver: bool = None,
+        rollout_policy: str = None,
+        rave: bool = None,
+        rave_equivalence: float = None,
+        candidate_radius: int = None,
+        widening: float = None,
+        widening_exponent: float = None,
+    ):
+        """
+        workers, playouts_per_worker -- параллельный по корню поиск (по умолчанию -- MCTS_WORKERS
+        и MCTS_PLAYOUTS_PER_WORKER из game_config); при workers == 1 поиск идёт в этом процессе.
+        threads, virtual_loss -- параллельный по дереву поиск в этом процессе
+        (по умолчанию -- MCTS_THREADS и MCTS_VIRTUAL_LOSS).
+        time_budget, node_budget -- пределы поиска на ход в секундах и узлах дерева
+        (по умолчанию -- MCTS_TIME_BUDGET и MCTS_NODE_BUDGET).
+        ponder -- обдумывание на времени соперника (по умолчанию -- MCTS_PONDER), см. start_pondering.
+        transpositions -- поиск с таблицей транспозиций (по умолчанию -- MCTS_TRANSPOSITIONS).
+        max_tree_nodes -- потолок узлов дерева, при достижении которого редко посещённые поддеревья удаляются
+        (по умолчанию -- MCTS_MAX_TREE_NODES); память дерева после хода -- в last_search.
+        early_stop -- ранняя остановка поиска, когда лучший ход уже решён (по умолчанию -- MCTS_EARLY_STOP).
+        solver -- MCTS-Solver: доказанные выигрыши и проигрыши поднимаются по дереву (по умолчанию -- MCTS_SOLVER).
+        rollout_policy -- доигрывание: "random" или "threat" (см. ROLLOUT_POLICIES, по умолчанию -- MCTS_ROLLOUT).
+        rave, rave_equivalence -- RAVE: оценки ходов смешиваются с AMAF-статистикой, вес AMAF убывает
+        с посещениями ребёнка (по умолчанию -- MCTS_RAVE и MCTS_RAVE_EQUIVALENCE).
+        candidate_radius -- раскрываются только ходы на таком расстоянии от занятых клеток
+        (по умолчанию -- MCTS_CANDIDATE_RADIUS, 0 -- все ходы).
+        widening, widening_exponent -- прогрессивное расширение: у узла с N посещениями
+        ceil(widening * N ** widening_exponent) детей, ближайших к занятым клеткам
+        (по умолчанию -- MCTS_WIDENING и MCTS_WIDENING_EXPONENT, 0 -- выключено).
+        MCTS-Solver не доказывает выигрыш по проигрышу всех детей с candidate_radius
+        и в узлах, где добавлены ещё не все ходы (см. tree.prove)
+        """
+        self.mcts = MCTS(
+            policy_value_function,
+            puct_constant,
+            playout_number,
+            geometry,
+            tree_storage,
+            workers,
+            playouts_per_worker,
+            threads,
+            virtual_loss,
+            time_budget,
+            node_budget,
+            ponder,
+            transpositions,
+            max_tree_nodes,
+            early_stop,
+            solver,
+            rollout_policy,
+            rave,
+            rave_equivalence,
+            candidate_radius,
+            widening,
+            widening_exponent,
+        )
 
     def reset_player(self) -> None:
-        self.mcts._root = Node()
+        self.mcts.reset()
+
+    def get_move(self, time_budget: float = None, node_budget: int = None) -> Field.Cell:
+        return self.mcts.get_move(time_budget, node_budget)
+
+    @property
+    def last_search(self) -> SearchStats:
+        return self.mcts.last_search
 
-    def get_move(self) -> Field.Cell:
-        return self.mcts.get_move()
+    def start_pondering(self) -> None:
+        self.mcts.start_pondering()
 
     def move_and_update(self, move: Field.Cell) -> None:
         self.mcts.move_and_update(move)
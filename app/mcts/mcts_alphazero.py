@@ -1,7 +1,28 @@
+from app.basic_game_core.config.game_config import (
+    MCTS_THREADS,
+    MCTS_VIRTUAL_LOSS,
+    MCTS_TIME_BUDGET,
+    MCTS_NODE_BUDGET,
+    MCTS_PONDER,
+    MCTS_PONDER_NODE_BUDGET,
+    MCTS_MAX_TREE_NODES,
+    MCTS_EARLY_STOP,
+    MCTS_SOLVER,
+    MCTS_CANDIDATE_RADIUS,
+    MCTS_WIDENING,
+    MCTS_WIDENING_EXPONENT,
+)
 from app.basic_game_core.field import Field, GameStates
-from app.basic_game_core.node import Node
+from app.basic_game_core.geometry import Geometry
+from app.basic_game_core.node import new_board, get_game_state, define_winner
 from app.basic_game_core.player import Player
+from app.mcts.candidates import candidate_moves, widening_limit
+from app.mcts.search_tree import new_tree
+from app.mcts.search_budget import SearchStats, run_playouts
+import contextlib
 import numpy as np
+import sys
+import threading
 
 
 def softmax(x):
@@ -12,57 +33,251 @@ def softmax(x):
 
 class MCTS:
 
-    def __init__(self, policy_value_function, puct_constant, playout_number):
-        self._root: Node = Node()
+    def __init__(
+        self,
+        policy_value_function,
+        puct_constant,
+        playout_number,
+        geometry: Geometry = None,
+        tree_storage: str = None,
+        threads: int = None,
+        virtual_loss: int = None,
+        time_budget: float = None,
+        node_budget: int = None,
+        ponder: bool = None,
+        transpositions: bool = None,
+        max_tree_nodes: int = None,
+        early_stop: bool = None,
+        solver: bool = None,
+        candidate_radius: int = None,
+        widening: float = None,
+        widening_exponent: float = None,
+    ):
+        self._geometry: Geometry = (
+            geometry if geometry is not None else Geometry.current()
+        )
+        # ObjectTree или ArrayTree (с таблицей транспозиций -- граф позиций), см. app.mcts.search_tree
+        self._tree = new_tree(tree_storage, transpositions)
+        self._board = new_board(self._geometry)  # позиция корня; во время плейаута -- позиция текущего узла
         self._policy_value_function = policy_value_function
         self._puct_constant: float = puct_constant
         self._playout_number: int = playout_number
+        self._threads: int = threads if threads is not None else MCTS_THREADS
+        # в однопоточном поиске блокировка и виртуальные потери не нужны
+        self._virtual_loss: int = (
+            (virtual_loss if virtual_loss is not None else MCTS_VIRTUAL_LOSS)
+            if self._threads > 1
+            else 0
+        )
+        self._tree_lock = (
+            threading.Lock() if self._threads > 1 else contextlib.nullcontext()
+        )
+        self._time_budget: float = (
+            time_budget if time_budget is not None else MCTS_TIME_BUDGET
+        )
+        self._node_budget: int = node_budget if node_budget is not None else MCTS_NODE_BUDGET
+        self._max_tree_nodes: int = (
+            max_tree_nodes if max_tree_nodes is not None else MCTS_MAX_TREE_NODES
+        )
+        self._early_stop: bool = early_stop if early_stop is not None else MCTS_EARLY_STOP
+        self._solver: bool = solver if solver is not None else MCTS_SOLVER
+        self._candidate_radius: int = (
+            candidate_radius if candidate_radius is not None else MCTS_CANDIDATE_RADIUS
+        )
+        # 0 -- без прогрессивного расширения (см. widening_limit)
+        self._widening: float = widening if widening is not None else MCTS_WIDENING
+        self._widening_exponent: float = (
+            widening_exponent if widening_exponent is not None else MCTS_WIDENING_EXPONENT
+        )
+        self.last_search: SearchStats = None  # итог последнего поиска (с памятью дерева после него)
+        self._ponder: bool = ponder if ponder is not None else MCTS_PONDER
+        self._ponder_thread: threading.Thread = None
+        self._ponder_stop = threading.Event()
+        self.last_ponder: SearchStats = None  # итог последнего обдумывания на времени соперника
 
-    def _run_playout(self) -> None:
-        node = self._root
-        while True:
-            if node.is_leaf():
-                break
-            action, node = node.select_action(self._puct_constant)
+    def reset(self) -> None:
+        self.stop_pondering()
+        self._tree.reset()
+        self._board = new_board(self._geometry)
 
-        actions_with_probs, leaf_value = self._policy_value_function(node)
+    def _run_playout(self, board=None) -> None:
+        """
+        Один плейаут на доске board (по умолчанию -- _board; потоки поиска передают свои копии).
+        Спуск и обновление дерева идут под _tree_lock, оценка сетью -- без блокировки.
+        С _solver спуск останавливается в раскрытом узле с доказанным исходом, его значение известно без сети,
+        а выигрыш в конце партии доказывается и поднимается по пути (tree.prove).
+        С _candidate_radius раскрываются только ходы рядом с занятыми клетками (их вероятности нормируются заново),
+        с прогрессивным расширением (_widening) ходы упорядочены по вероятности сети и добавляются в дети
+        по мере посещений узла
+        """
+        tree = self._tree
+        board = board if board is not None else self._board
+        with self._tree_lock:
+            node = tree.root
+            path = [node]  # путь выбора от корня до листа
+            while True:
+                if tree.is_leaf(node):
+                    if tree.transpositions is None or len(path) == 1:
+                        break
+                    # позиция могла встретиться при другом порядке ходов -- тогда спуск продолжается из её узла
+                    node = tree.find_transposition(path[-2], action, node, board.zobrist)
+                    path[-1] = node
+                    if tree.is_leaf(node):
+                        break
+                if tree.proven_outcome(node):
+                    break
+                action, node = tree.select_child(
+                    node,
+                    self._puct_constant,
+                    max_children=widening_limit(
+                        tree.visit_count(node), self._widening, self._widening_exponent
+                    )
+                    if self._widening
+                    else 0,
+                )
+                board.push_action(action)
+                path.append(node)
+            if self._virtual_loss:
+                tree.add_virtual_loss(path, self._virtual_loss)
+            # лист оценивается заново, даже если доказан: это конец партии (исход подтвердится)
+            # или узел, свёрнутый tree.prune, -- его нужно раскрыть
+            proven = 0 if tree.is_leaf(node) else tree.proven_outcome(node)
 
-        game_state = node.check_game_state()
-        if game_state == GameStates.CONTINUE:
-            node.expand_node(actions_with_probs)
+        actions_with_probs = None
+        if proven:
+            leaf_value = -proven
         else:
-            winner = node.define_winner(game_state)
-
-            if winner == node.who_moves:
-                leaf_value = 1
-            elif winner == Player.Type.NONE:
-                leaf_value = 0
+            game_state = get_game_state(board)
+            if game_state == GameStates.CONTINUE:
+                actions_with_probs, leaf_value = self._policy_value_function(board)
+                if self._candidate_radius or self._widening:
+                    actions_with_probs = candidate_moves(
+                        board,
+                        actions_with_probs,
+                        self._candidate_radius,
+                        "prior" if self._widening else None,
+                    )
             else:
-                leaf_value = -1
+                # конец партии: оценка известна без сети
+                winner = define_winner(game_state)
+
+                if winner == board.who_moves:
+                    leaf_value = 1
+                elif winner == Player.Type.NONE:
+                    leaf_value = 0
+                else:
+                    leaf_value = -1
+                    if self._solver:  # ход в узел выиграл партию
+                        proven = 1
+
+        with self._tree_lock:
+            if actions_with_probs is not None:
+                tree.expand(
+                    node,
+                    actions_with_probs,
+                    widening_limit(
+                        tree.visit_count(node), self._widening, self._widening_exponent
+                    )
+                    if self._widening
+                    else 0,
+                )
+            if self._virtual_loss:
+                tree.remove_virtual_loss(path, self._virtual_loss)
+            tree.backup(path, -leaf_value)
+            if proven:
+                # с candidate_radius дети узла -- не обязательно все ходы: ход вне них может спасти,
+                # и выигрыш по проигрышу всех детей не доказывается (с widening дерево решает это
+                # само -- по тому, добавлены ли уже все ходы узла)
+                tree.prove(path, proven, not self._candidate_radius)
+
+        for _ in range(len(path) - 1):
+            board.pop()
+
+    def _run_playouts(self, time_budget: float = None, node_budget: int = None) -> None:
+        """
+        Поиск до первого из пределов: _playout_number плейаутов, time_budget секунд, node_budget узлов
+        (по умолчанию -- _time_budget и _node_budget); итог -- в last_search
+        """
+        self.last_search = run_playouts(
+            self._run_playout,
+            self._board,
+            self._tree,
+            self._playout_number,
+            self._threads,
+            time_budget if time_budget is not None else self._time_budget,
+            node_budget if node_budget is not None else self._node_budget,
+            max_tree_nodes=self._max_tree_nodes,
+            early_stop=self._early_stop,
+            tree_lock=self._tree_lock,
+        )
+
+    def start_pondering(self) -> None:
+        """
+        Если включено обдумывание (_ponder), запускает фоновый поиск от текущего корня, пока думает соперник.
+        Поиск идёт до stop_pondering (его вызывают get_move, move_and_update и reset), ограничен
+        _node_budget (если он не задан -- MCTS_PONDER_NODE_BUDGET); накопленная статистика остаётся
+        в поддереве хода соперника. Итог -- в last_ponder
+        """
+        if not self._ponder or self._ponder_thread is not None:
+            return
+        if get_game_state(self._board) != GameStates.CONTINUE:
+            return
+        self._ponder_stop.clear()
+        self._ponder_thread = threading.Thread(target=self._run_pondering, daemon=True)
+        self._ponder_thread.start()
+
+    def _run_pondering(self) -> None:
+        self.last_ponder = run_playouts(
+            self._run_playout,
+            self._board,
+            self._tree,
+            sys.maxsize,
+            self._threads,
+            node_budget=self._node_budget or MCTS_PONDER_NODE_BUDGET,
+            stop_event=self._ponder_stop,
+            max_tree_nodes=self._max_tree_nodes,
+            tree_lock=self._tree_lock,
+        )
 
-        node.update_all_ancestors_recursively(-leaf_value)
+    def stop_pondering(self) -> None:
+        if self._ponder_thread is None:
+            return
+        self._ponder_stop.set()
+        self._ponder_thread.join()
+        self._ponder_thread = None
 
-    def get_move_probs(self, temperature_contant: float):
-        for _ in range(self._playout_number):
-            self._run_playout()
+    def get_move_probs(
+        self, temperature_contant: float, time_budget: float = None, node_budget: int = None
+    ):
+        """
+        Вероятности ходов по посещениям после поиска, который останавливается на первом из пределов:
+        _playout_number плейаутов, time_budget секунд или node_budget узлов дерева
+        (по умолчанию -- заданные в конструкторе). Итог поиска -- в last_search.
+        Доказанные исходы важнее посещений: если есть доказанно выигрышные ходы, вероятность делится
+        только между ними, а доказанно проигрышные ходы получают нулевые посещения, пока есть другие
+        """
+        self.stop_pondering()
+        self._run_playouts(time_budget, node_budget)
 
         actions_with_visits = [
-            (action, node._visits_number)
-            for action, node in self._root._children.items()
+            (action, self._tree.visit_count(node), self._tree.proven_outcome(node))
+            for action, node in self._tree.children(self._tree.root)
         ]
-        actions, visits = zip(*actions_with_visits)
-        action_probs = softmax(
-            1.0 / temperature_contant * np.log(np.array(visits) + 1e-10)
-        )
+        actions, visits, proven = zip(*actions_with_visits)
+        visits = np.array(visits, dtype=np.float64)
+        proven = np.array(proven)
+        if proven.max() == 1:
+            visits = (proven == 1).astype(np.float64)
+        elif proven.max() == 0:
+            visits[proven == -1] = 0
+        action_probs = softmax(1.0 / temperature_contant * np.log(visits + 1e-10))
 
         return actions, action_probs
 
     def move_and_update(self, move: Field.Cell) -> None:
-        if move in self._root._children:
-            self._root = self._root._children[move]
-        else:
-            self._root = Node(self._root, move)
-        self._root._parent = None
+        self.stop_pondering()
+        self._tree.move_root(self._geometry.encode_action(move))
+        self._board.push(move)
 
 
 class MCTSPlayer:
@@ -73,53 +288,106 @@ class MCTSPlayer:
         puct_constant: float,
         playout_number: int,
         is_selfplay: bool,
+        geometry: Geometry = None,
+        tree_storage: str = None,
+        threads: int = None,
+        virtual_loss: int = None,
+        time_budget: float = None,
+        node_budget: int = None,
+        ponder: bool = None,
+        transpositions: bool = None,
+        max_tree_nodes: int = None,
+        early_stop: bool = None,
+        solver: bool = None,
+        candidate_radius: int = None,
+        widening: float = None,
+        widening_exponent: float = None,
     ):
-        self.mcts = MCTS(policy_value_function, puct_constant, playout_number)
+        """
+        threads, virtual_loss -- параллельный по дереву поиск (по умолчанию -- MCTS_THREADS
+        и MCTS_VIRTUAL_LOSS из game_config).
+        time_budget, node_budget -- пределы поиска на ход в секундах и узлах дерева
+        (по умолчанию -- MCTS_TIME_BUDGET и MCTS_NODE_BUDGET).
+        ponder -- обдумывание на времени соперника (по умолчанию -- MCTS_PONDER), см. MCTS.start_pondering.
+        transpositions -- поиск с таблицей транспозиций (по умолчанию -- MCTS_TRANSPOSITIONS):
+        позиция, уже оценённая сетью при другом порядке ходов, повторно не оценивается.
+        max_tree_nodes -- потолок узлов дерева, при достижении которого редко посещённые поддеревья удаляются
+        (по умолчанию -- MCTS_MAX_TREE_NODES); память дерева после хода -- в last_search.
+        early_stop -- ранняя остановка поиска, когда лучший ход уже решён (по умолчанию -- MCTS_EARLY_STOP, в self-play -- выключена: нужно полное распределение посещений).
+        solver -- MCTS-Solver: доказанные выигрыши и проигрыши поднимаются по дереву (по умолчанию -- MCTS_SOLVER,
+        в self-play -- выключен: доказанные исходы меняют распределение посещений -- цель обучения).
+        candidate_radius -- раскрываются только ходы на таком расстоянии от занятых клеток
+        (по умолчанию -- MCTS_CANDIDATE_RADIUS, 0 -- все ходы).
+        widening, widening_exponent -- прогрессивное расширение: у узла с N посещениями
+        ceil(widening * N ** widening_exponent) детей с наибольшей вероятностью сети
+        (по умолчанию -- MCTS_WIDENING и MCTS_WIDENING_EXPONENT, 0 -- выключено).
+        MCTS-Solver не доказывает выигрыш по проигрышу всех детей с candidate_radius
+        и в узлах, где добавлены ещё не все ходы (см. tree.prove)
+        """
+        self.mcts = MCTS(
+            policy_value_function,
+            puct_constant,
+            playout_number,
+            geometry,
+            tree_storage,
+            threads,
+            virtual_loss,
+            time_budget,
+            node_budget,
+            ponder,
+            transpositions,
+            max_tree_nodes,
+            early_stop if early_stop is not None else MCTS_EARLY_STOP and not is_selfplay,
+            solver if solver is not None else MCTS_SOLVER and not is_selfplay,
+            candidate_radius,
+            widening,
+            widening_exponent,
+        )
         self._is_selfplay = is_selfplay
 
     def reset_player(self) -> None:
-        self.mcts._root = Node()
+        self.mcts.reset()
 
     def move_and_update(self, move: Field.Cell) -> None:
         self.mcts.move_and_update(move)
 
-    def get_move(self, temperature_contant: float = 1e-3, return_prob: bool = False):
-        count_different_figures = 1 << (Field.COUNT_FEATURES - 1)
-        move_probs = np.zeros(count_different_figures * Field.HEIGHT * Field.WIDTH)
-        moves, probs = self.mcts.get_move_probs(temperature_contant)
-        moves = [
-            (cell.figure % count_different_figures) * Field.WIDTH * Field.HEIGHT
-            + cell.row * Field.WIDTH
-            + cell.col
-            for cell in moves
-        ]
-        move_probs[moves] = probs
+    @property
+    def last_search(self) -> SearchStats:
+        return self.mcts.last_search
+
+    def start_pondering(self) -> None:
+        self.mcts.start_pondering()
+
+    def get_move(
+        self,
+        temperature_contant: float = 1e-3,
+        return_prob: bool = False,
+        time_budget: float = None,
+        node_budget: int = None,
+    ):
+        board = self.mcts._board
+        move_probs = np.zeros(board.geometry.actions_count)
+        moves, probs = self.mcts.get_move_probs(
+            temperature_contant, time_budget, node_budget
+        )
+        move_probs[list(moves)] = probs
 
         if self._is_selfplay:
             # add Dirichlet Noise for exploration
-            move = np.random.choice(
-                moves,
-                p=0.75 * probs + 0.25 * np.random.dirichlet(0.3 * np.ones(len(probs))),
+            move = int(
+                np.random.choice(
+                    moves,
+                    p=0.75 * probs
+                    + 0.25 * np.random.dirichlet(0.3 * np.ones(len(probs))),
+                )
             )
-            move_cell = Field.Cell(
-                move % (Field.WIDTH * Field.HEIGHT) // Field.WIDTH,
-                move % Field.WIDTH,
-                move // (Field.WIDTH * Field.HEIGHT),
-            )
-            if self.mcts._root.who_moves == Player.Type.NAUGHT:
-                move_cell.figure += count_different_figures
+            move_cell = board.geometry.decode_action(move, board.who_moves)
             self.mcts.move_and_update(move_cell)
         else:
             # with the default temperature_contant=1e-3, it is almost
             # equivalent to choosing the move with the highest prob
-            move = np.random.choice(moves, p=probs)
-            move_cell = Field.Cell(
-                move % (Field.WIDTH * Field.HEIGHT) // Field.WIDTH,
-                move % Field.WIDTH,
-                move // (Field.WIDTH * Field.HEIGHT),
-            )
-            if self.mcts._root.who_moves == Player.Type.NAUGHT:
-                move_cell.figure += count_different_figures
+            move = int(np.random.choice(moves, p=probs))
+            move_cell = board.geometry.decode_action(move, board.who_moves)
             # print(f'Best move: {move_cell.row} {move_cell.col} {move_cell.figure}')
 
         if return_prob:
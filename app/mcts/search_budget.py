@@ -0,0 +1,159 @@
+from app.mcts.tree_parallel import run_threaded_playouts
+import threading
+import time
+
+# при переполнении дерева (max_tree_nodes) оно сокращается до этой доли предела
+PRUNE_TARGET_FRACTION = 0.5
+# раз во сколько плейаутов проверяется, решён ли уже ход (early_stop)
+EARLY_STOP_INTERVAL = 16
+
+
+class SearchStats:
+    """
+    Итог одного поиска: сколько плейаутов сделано, за сколько секунд, сколько узлов в дереве и байт оно занимает,
+    сколько раз дерево сокращалось (prunes), какой предел остановил поиск
+    (stop_reason: "playouts", "time", "nodes", "request" -- остановлен извне, "decided" -- ход уже решён
+    или "proven" -- исход корня доказан) и сколько плейаутов сэкономила ранняя остановка
+    (saved_playouts; при пределе по времени -- оценка)
+    """
+
+    __slots__ = (
+        "playouts",
+        "elapsed_time",
+        "nodes_count",
+        "stop_reason",
+        "memory_bytes",
+        "prunes",
+        "saved_playouts",
+    )
+
+    def __init__(
+        self,
+        playouts=0,
+        elapsed_time=0.0,
+        nodes_count=0,
+        stop_reason="playouts",
+        memory_bytes=0,
+        prunes=0,
+        saved_playouts=0,
+    ):
+        self.playouts: int = playouts
+        self.elapsed_time: float = elapsed_time
+        self.nodes_count: int = nodes_count
+        self.stop_reason: str = stop_reason
+        self.memory_bytes: int = memory_bytes
+        self.prunes: int = prunes
+        self.saved_playouts: int = saved_playouts
+
+    def __str__(self):
+        return (
+            f"{self.playouts} playouts in {self.elapsed_time:.3f} s "
+            f"(stopped by {self.stop_reason}), {self.nodes_count} nodes, "
+            f"{self.memory_bytes / 2**20:.1f} MiB, {self.prunes} prunes, "
+            f"{self.saved_playouts} playouts saved"
+        )
+
+
+def run_playouts(
+    run_playout,
+    board,
+    tree,
+    playout_number: int,
+    threads: int = 1,
+    time_budget: float = None,
+    node_budget: int = None,
+    stop_event: threading.Event = None,
+    max_tree_nodes: int = None,
+    early_stop: bool = False,
+    tree_lock=None,
+) -> SearchStats:
+    """
+    Делает плейауты run_playout, пока не исчерпан первый из пределов: playout_number плейаутов,
+    time_budget секунд, node_budget узлов в дереве tree (None или 0 -- предела нет)
+    или установки stop_event из другого потока.
+    Первый плейаут делается всегда, чтобы у корня были дети и было из чего выбрать ход.
+    Когда в дереве становится max_tree_nodes узлов, плейауты приостанавливаются и дерево сокращается
+    (tree.prune) до PRUNE_TARGET_FRACTION предела; если сократить не удалось -- поиск останавливается.
+    early_stop -- поиск останавливается, как только самый посещённый ребёнок корня уже нельзя догнать:
+    отрыв от второго больше оставшихся плейаутов (при пределе по времени -- ожидаемых по текущей скорости)
+    с запасом на плейауты, ещё идущие в других потоках. Ребёнок у корня один -- ход решён сразу.
+    Когда исход корня доказан (tree.proven_outcome, см. MCTS-Solver в tree.prove), поиск не продолжается --
+    тоже только после первого плейаута: корень, ставший листом, сначала раскрывается.
+    threads > 1 -- плейауты идут в стольких потоках по общему дереву (см. run_threaded_playouts);
+    tree_lock -- блокировка, под которой run_playout меняет дерево: пределы проверяются под ней же
+    """
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget if time_budget else None
+    stats = SearchStats()
+
+    def remaining_playouts() -> int:
+        """
+        Сколько плейаутов ещё осталось бы: по playout_number, а при пределе по времени -- не больше,
+        чем успеется по текущей скорости
+        """
+        remaining = playout_number - stats.playouts
+        if deadline is not None and stats.playouts:
+            now = time.perf_counter()
+            remaining = min(
+                remaining,
+                int(
+                    stats.playouts
+                    * (deadline - now)
+                    / max(now - start_time, 1e-9)
+                ),
+            )
+        return remaining
+
+    def next_playout() -> bool:
+        if stop_event is not None and stop_event.is_set():
+            stats.stop_reason = "request"
+            return False
+        if stats.playouts:
+            if tree.proven_outcome(tree.root):
+                stats.stop_reason = "proven"
+                # обдумывание идёт до остановки извне -- экономить ему нечего
+                if stop_event is None:
+                    stats.saved_playouts = remaining_playouts()
+                return False
+            if stats.playouts >= playout_number:
+                stats.stop_reason = "playouts"
+                return False
+            if deadline is not None and time.perf_counter() >= deadline:
+                stats.stop_reason = "time"
+                return False
+            if node_budget and tree.nodes_count() >= node_budget:
+                stats.stop_reason = "nodes"
+                return False
+            if max_tree_nodes and tree.nodes_count() >= max_tree_nodes:
+                stats.stop_reason = "prune"
+                return False
+            if early_stop and (
+                stats.playouts == 1 or stats.playouts % EARLY_STOP_INTERVAL == 0
+            ):
+                remaining = remaining_playouts()
+                best, second = tree.best_two_visits(tree.root)
+                if second is None or best - second > remaining + threads - 1:
+                    stats.stop_reason = "decided"
+                    stats.saved_playouts = remaining
+                    return False
+        stats.playouts += 1
+        return True
+
+    while True:
+        if threads > 1:
+            run_threaded_playouts(run_playout, board, threads, next_playout, tree_lock)
+        else:
+            while next_playout():
+                run_playout()
+        if stats.stop_reason != "prune":
+            break
+        tree.prune(int(max_tree_nodes * PRUNE_TARGET_FRACTION))
+        stats.prunes += 1
+        if tree.nodes_count() >= max_tree_nodes:
+            stats.stop_reason = "nodes"
+            break
+
+    stats.elapsed_time = time.perf_counter() - start_time
+    stats.nodes_count = tree.nodes_count()
+    stats.memory_bytes = tree.memory_bytes()
+    return stats
@@ -0,0 +1,18 @@
+from app.basic_game_core.config.game_config import MCTS_TREE, MCTS_TRANSPOSITIONS
+from app.mcts.tree_node import ObjectTree
+from app.mcts.array_tree import ArrayTree
+
+TREE_STORAGES = {"object": ObjectTree, "array": ArrayTree}
+
+
+def new_tree(storage: str = None, transpositions: bool = None):
+    """
+    Пустое дерево поиска: "object" -- узлы TreeNode, "array" -- структура массивов ArrayTree;
+    transpositions -- с таблицей транспозиций (поиск по графу позиций).
+    По умолчанию -- MCTS_TREE и MCTS_TRANSPOSITIONS из game_config
+    """
+    return TREE_STORAGES[storage if storage is not None else MCTS_TREE](
+        transpositions=(
+            transpositions if transpositions is not None else MCTS_TRANSPOSITIONS
+        )
+    )
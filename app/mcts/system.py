@@ -3,7 +3,6 @@ import psutil
 import os
 import threading
 import numpy as np
-from app.basic_game_core.node import Node
 
 
 class WrongMethodError(Exception):
@@ -20,7 +19,7 @@ def measure_mcts_performance(func):
     :raises WrongMethodError: Если декоратор используется не на методе MCTS
     """
 
-    # тут я патчу Node.select_action. Критика приветствуется.
+    # тут я патчу backup дерева поиска. Критика приветствуется.
     def wrapper(*args, **kwargs):
         if not hasattr(args[0], "_run_playout"):
             raise WrongMethodError(
@@ -58,45 +57,49 @@ def measure_mcts_performance(func):
 
         args[0]._run_playout = new_run_playout
 
-        original_node_select_action = Node.select_action
+        # статистику по узлам собираем по пути выбора, который поиск передаёт в backup дерева
+        tree = args[0]._tree
+        original_backup = tree.backup
 
-        def new_node_select_action(self, puct_constant):
-            action, node = original_node_select_action(self, puct_constant)
-            if node is not None:
-                depth = node.get_depth()
+        def new_backup(path, leaf_value):
+            puct_constant = args[0]._puct_constant
+            for depth, (parent, node) in enumerate(zip(path, path[1:]), start=1):
                 mcts_stats["depths"].append(depth)
                 mcts_stats["total_nodes"] += 1
 
                 # соберем статистику по узлам
-                node_id = id(node)
-                if node_id not in mcts_stats["node_values"]:
-                    mcts_stats["node_values"][node_id] = {"visits": 0, "value": 0}
+                if node not in mcts_stats["node_values"]:
+                    mcts_stats["node_values"][node] = {"visits": 0, "value": 0}
 
-                mcts_stats["node_values"][node_id]["visits"] = node._visits_number
-                mcts_stats["node_values"][node_id]["value"] = node._estimate_value
+                mcts_stats["node_values"][node]["visits"] = tree.visit_count(node)
+                mcts_stats["node_values"][node]["value"] = tree.value(node)
 
-                if hasattr(node, "_children"):
-                    mcts_stats["branching_factors"].append(len(node._children))
+                mcts_stats["branching_factors"].append(len(tree.children(node)))
 
-                if hasattr(node, "get_node_value"):
-                    mcts_stats["ucb_values"].append(node.get_node_value(puct_constant))
+                mcts_stats["ucb_values"].append(
+                    tree.value(node)
+                    + puct_constant
+                    * tree.prior_probability(node)
+                    * np.sqrt(tree.visit_count(parent))
+                    / (1 + tree.visit_count(node))
+                )
 
-            return action, node
+            return original_backup(path, leaf_value)
 
-        Node.select_action = new_node_select_action
+        tree.backup = new_backup
 
         if hasattr(args[0], "_run_rollout"):
             original_run_rollout = args[0]._run_rollout
 
-            def new_run_rollout(node):
+            def new_run_rollout(node, *args):
                 if node is not None:
-                    result = original_run_rollout(node)
+                    result = original_run_rollout(node, *args)
                     if result > 0:  # победа
                         mcts_stats["winning_simulations"] += 1
 
                     return result
 
-                return original_run_rollout(node)
+                return original_run_rollout(node, *args)
 
             args[0]._run_rollout = new_run_rollout
 
@@ -128,8 +131,7 @@ def measure_mcts_performance(func):
             # возвращаем методы, как было
             if original_run_playout:
                 args[0]._run_playout = original_run_playout
-            if original_node_select_action:
-                Node.select_action = original_node_select_action
+            tree.backup = original_backup
             if original_run_rollout:
                 args[0]._run_rollout = original_run_rollout
 
@@ -0,0 +1,439 @@
+from typing import ForwardRef
+import heapq
+import numpy as np
+import sys
+
+
+class TreeNode:
+    """
+    Узел дерева MCTS: только статистика и ход, которым в него пришли.
+    Позиция в узле не хранится -- поиск восстанавливает её на доске ходами вдоль пути выбора.
+    Ходы в дереве -- номера действий (см. Geometry.encode_action), дети хранятся по ним.
+    Ссылки на родителя нет: поиск запоминает путь от корня и обновляет статистику по нему.
+    _virtual_loss -- виртуальные потери от незавершённых плейаутов параллельного поиска
+    _proven -- доказанный исход хода в узел для сделавшего его: 1 -- выигрыш, -1 -- проигрыш, 0 -- не доказан
+    _amaf_visits, _amaf_value -- RAVE (AMAF): сколько плейаутов из родителя сделали ход узла
+    в любой момент (не только первым) и средний их результат для сделавшего ход
+    _pending -- ещё не добавленные прогрессивным расширением ходы [(действие, вероятность), ...]
+    в обратном порядке раскрытия (следующий -- последний) или None
+    """
+
+    __slots__ = (
+        "move",
+        "_children",
+        "_visits_number",
+        "_estimate_value",
+        "_prior_probability",
+        "_virtual_loss",
+        "_proven",
+        "_amaf_visits",
+        "_amaf_value",
+        "_pending",
+    )
+
+    def __init__(self, move=None, prior_probability=1.0):
+        self.move: int = move
+        self._children: dict[int, TreeNode] = {}
+        self._visits_number: int = 0
+        self._estimate_value: float = 0
+        self._prior_probability: float = prior_probability
+        self._virtual_loss: int = 0
+        self._proven: int = 0
+        self._amaf_visits: int = 0
+        self._amaf_value: float = 0
+        self._pending: list[tuple[int, float]] = None
+
+    def get_node_value(self, puct_constant: float, parent_visits: int) -> float:
+        exploration_bonus = (
+            puct_constant
+            * self._prior_probability
+            * np.sqrt(parent_visits)
+            / (1 + self._visits_number)
+        )
+        return self._estimate_value + exploration_bonus
+
+    def select_action(self, puct_constant) -> tuple[int, ForwardRef("TreeNode")]:
+        """
+        Ребёнок с наибольшим get_node_value; корень из числа посещений считается один раз на узел.
+        Доказанные дети не выбираются, пока есть недоказанные
+        """
+        parent_visits_sqrt = np.sqrt(self._visits_number)
+        return max(
+            self._children.items(),
+            key=lambda child: -np.inf
+            if child[1]._proven
+            else child[1]._estimate_value
+            + puct_constant
+            * child[1]._prior_probability
+            * parent_visits_sqrt
+            / (1 + child[1]._visits_number),
+        )
+
+    def select_action_with_virtual_loss(
+        self, puct_constant
+    ) -> tuple[int, ForwardRef("TreeNode")]:
+        """
+        select_action, в котором каждая единица виртуальной потери узла считается посещением
+        с проигрышем (значением -1) для выбирающего
+        """
+        parent_visits_sqrt = np.sqrt(self._visits_number + self._virtual_loss)
+
+        def node_value(child) -> float:
+            node = child[1]
+            if node._proven:
+                return -np.inf
+            visits = node._visits_number + node._virtual_loss
+            estimate = (
+                (node._estimate_value * node._visits_number - node._virtual_loss) / visits
+                if visits
+                else 0.0
+            )
+            return estimate + puct_constant * node._prior_probability * parent_visits_sqrt / (
+                1 + visits
+            )
+
+        return max(self._children.items(), key=node_value)
+
+    def select_action_rave(
+        self, puct_constant, rave_equivalence: float
+    ) -> tuple[int, ForwardRef("TreeNode")]:
+        """
+        select_action_with_virtual_loss, в котором оценка ребёнка Q смешана с его AMAF-оценкой:
+        (1 - beta) * Q + beta * Q_amaf, beta = sqrt(rave_equivalence / (3 * N + rave_equivalence)).
+        rave_equivalence -- число посещений, при котором у обеих оценок примерно равный вес
+        """
+        parent_visits_sqrt = np.sqrt(self._visits_number + self._virtual_loss)
+
+        def node_value(child) -> float:
+            node = child[1]
+            if node._proven:
+                return -np.inf
+            visits = node._visits_number + node._virtual_loss
+            estimate = (
+                (node._estimate_value * node._visits_number - node._virtual_loss) / visits
+                if visits
+                else 0.0
+            )
+            beta = (rave_equivalence / (3 * visits + rave_equivalence)) ** 0.5
+            estimate += beta * (node._amaf_value - estimate)
+            return estimate + puct_constant * node._prior_probability * parent_visits_sqrt / (
+                1 + visits
+            )
+
+        return max(self._children.items(), key=node_value)
+
+    def update_node(self, leaf_value: float) -> None:
+        self._visits_number += 1
+        self._estimate_value += (
+            leaf_value - self._estimate_value
+        ) / self._visits_number
+
+    def expand_node(
+        self, actions_with_prior_probabilities: list[tuple[int, float]], max_children: int = 0
+    ) -> None:
+        """
+        max_children > 0 -- прогрессивное расширение: дети создаются только для первых max_children ходов,
+        остальные откладываются в _pending (см. add_pending_children)
+        """
+        if max_children:
+            actions_with_prior_probabilities = list(actions_with_prior_probabilities)
+            if len(actions_with_prior_probabilities) > max_children:
+                self._pending = actions_with_prior_probabilities[: max_children - 1 : -1]
+                actions_with_prior_probabilities = actions_with_prior_probabilities[:max_children]
+        for action, probability in actions_with_prior_probabilities:
+            if action not in self._children:
+                self._children[action] = TreeNode(action, probability)
+
+    def add_pending_children(self, max_children: int) -> int:
+        """
+        Добавляет отложенные ходы по порядку раскрытия, пока детей меньше max_children; возвращает число новых детей
+        """
+        added = 0
+        while self._pending and len(self._children) < max_children:
+            action, probability = self._pending.pop()
+            if action not in self._children:
+                self._children[action] = TreeNode(action, probability)
+                added += 1
+        if not self._pending:
+            self._pending = None
+        return added
+
+    def is_leaf(self) -> bool:
+        return self._children == {}
+
+
+# оценка памяти на узел ObjectTree: TreeNode, его словарь детей, число оценки и запись в словаре родителя
+NODE_BYTES = (
+    sys.getsizeof(TreeNode())
+    + sys.getsizeof({})
+    + sys.getsizeof(0.0)
+    + sys.getsizeof(dict.fromkeys(range(1024))) // 1024
+)
+
+
+class ObjectTree:
+    """
+    Дерево поиска из объектов TreeNode. Узел дерева -- сам объект TreeNode.
+    Интерфейс общий с ArrayTree (app.mcts.array_tree), MCTS работает только через него.
+    virtual_loss_paths -- число путей, на которых сейчас лежат виртуальные потери.
+    Число узлов поддерживается при раскрытии и пересчитывается обходом только в move_root.
+
+    transpositions -- таблица транспозиций (ключ позиции -> узел) или None, если она выключена.
+    Позиция, уже встречавшаяся в дереве, получает тот же объект TreeNode, и дерево становится графом
+    """
+
+    def __init__(self, transpositions: bool = False):
+        self.root: TreeNode = TreeNode()
+        self.virtual_loss_paths: int = 0
+        self._nodes_count: int = 1
+        self.transpositions: dict[int, TreeNode] = {} if transpositions else None
+
+    def reset(self) -> None:
+        self.root = TreeNode()
+        self.virtual_loss_paths = 0
+        self._nodes_count = 1
+        if self.transpositions is not None:
+            self.transpositions = {}
+
+    def is_leaf(self, node: TreeNode) -> bool:
+        return node.is_leaf()
+
+    def select_child(
+        self,
+        node: TreeNode,
+        puct_constant: float,
+        rave_equivalence: float = 0.0,
+        max_children: int = 0,
+    ) -> tuple[int, TreeNode]:
+        """
+        max_children > 0 -- прогрессивное расширение: если детей меньше max_children,
+        сначала добавляются отложенные при раскрытии ходы
+        """
+        if node._pending and len(node._children) < max_children:
+            self._nodes_count += node.add_pending_children(max_children)
+        if rave_equivalence:
+            return node.select_action_rave(puct_constant, rave_equivalence)
+        if self.virtual_loss_paths:
+            return node.select_action_with_virtual_loss(puct_constant)
+        return node.select_action(puct_constant)
+
+    def expand(
+        self,
+        node: TreeNode,
+        actions_with_prior_probabilities: list[tuple[int, float]],
+        max_children: int = 0,
+    ) -> None:
+        if not node.is_leaf():
+            return
+        children_count = len(node._children)
+        node.expand_node(actions_with_prior_probabilities, max_children)
+        self._nodes_count += len(node._children) - children_count
+
+    def backup(self, path: list[TreeNode], leaf_value: float) -> None:
+        """
+        Обновляет узлы пути выбора path (от корня до листа): лист -- значением leaf_value,
+        каждый узел выше -- со сменой знака
+        """
+        for node in reversed(path):
+            node.update_node(leaf_value)
+            leaf_value = -leaf_value
+
+    def backup_amaf(self, path: list[TreeNode], actions: list[int], leaf_value: float) -> None:
+        """
+        RAVE: actions -- все ходы плейаута, len(path) - 1 ходов по дереву и затем ходы доигрывания.
+        У каждого узла пути path[i] дети, чьи действия ходящий в path[i] сделал на глубине i или позже,
+        получают в AMAF-статистику результат плейаута для него -- то же значение, что backup даёт path[i + 1]
+        """
+        depth_value = leaf_value  # значение узла path[depth + 1]
+        for depth in range(len(path) - 2, -1, -1):
+            children = path[depth]._children
+            for action in set(actions[depth::2]):
+                child = children.get(action)
+                if child is not None:
+                    child._amaf_visits += 1
+                    child._amaf_value += (depth_value - child._amaf_value) / child._amaf_visits
+            depth_value = -depth_value
+
+    def prove(self, path: list[TreeNode], proven: int, all_moves_expanded: bool = True) -> None:
+        """
+        MCTS-Solver: лист пути path получает доказанный исход proven (1 -- ход в него выигрывает, -1 -- проигрывает),
+        и доказательство поднимается к корню: узел с выигрышным ходом проигран для пришедшего в него,
+        узел, все ходы из которого проигрывают, -- выигран. Подъём останавливается на первом недоказанном узле.
+        all_moves_expanded=False -- дети узлов раскрыты не по всем допустимым ходам (кандидаты ограничены):
+        нераскрытый ход может спасти, и выигрыш по проигрышу всех детей не доказывается.
+        То же для узла, у которого прогрессивное расширение добавило ещё не все ходы
+        """
+        path[-1]._proven = proven
+        for depth in range(len(path) - 1, 0, -1):
+            node, parent = path[depth], path[depth - 1]
+            if node._proven == 1:
+                parent._proven = -1
+            elif all_moves_expanded and not parent._pending and all(
+                child._proven == -1 for child in parent._children.values()
+            ):
+                parent._proven = 1
+            else:
+                break
+
+    def find_transposition(
+        self, parent: TreeNode, action: int, node: TreeNode, key: int
+    ) -> TreeNode:
+        """
+        Узел позиции с ключом key, в которую пришли из parent действием action в лист node.
+        Если позиция уже есть в дереве под другим узлом, parent ведёт по action в тот узел и он возвращается,
+        иначе node запоминается в таблице транспозиций и возвращается сам
+        """
+        canonical = self.transpositions.setdefault(key, node)
+        if canonical is not node:
+            parent._children[action] = canonical
+            self._nodes_count -= 1
+        return canonical
+
+    def add_virtual_loss(self, path: list[TreeNode], amount: int) -> None:
+        """
+        Виртуальная потеря amount на узлах пути path: пока плейаут по нему не закончен,
+        другие потоки поиска реже выбирают этот путь
+        """
+        for node in path:
+            node._virtual_loss += amount
+        self.virtual_loss_paths += 1
+
+    def remove_virtual_loss(self, path: list[TreeNode], amount: int) -> None:
+        for node in path:
+            node._virtual_loss -= amount
+        self.virtual_loss_paths -= 1
+
+    def children(self, node: TreeNode) -> list[tuple[int, TreeNode]]:
+        return list(node._children.items())
+
+    def best_two_visits(self, node: TreeNode) -> tuple[int, int]:
+        """
+        Два наибольших числа посещений среди детей node; второе -- None, если ребёнок один (или детей нет)
+        """
+        visits = heapq.nlargest(
+            2, (child._visits_number for child in node._children.values())
+        )
+        if len(visits) < 2:
+            return (visits[0] if visits else 0), None
+        return visits[0], visits[1]
+
+    def visit_count(self, node: TreeNode) -> int:
+        return node._visits_number
+
+    def value(self, node: TreeNode) -> float:
+        return node._estimate_value
+
+    def prior_probability(self, node: TreeNode) -> float:
+        return node._prior_probability
+
+    def proven_outcome(self, node: TreeNode) -> int:
+        return node._proven
+
+    def pending_virtual_loss(self, node: TreeNode) -> int:
+        return node._virtual_loss
+
+    def move_root(self, action: int) -> None:
+        """
+        Делает корнем ребёнка по действию action (поддерево сохраняется) или новый узел
+        """
+        if action in self.root._children:
+            self.root = self.root._children[action]
+        else:
+            self.root = TreeNode(action)
+        self._forget_unreachable()
+
+    def prune(self, target_nodes: int) -> None:
+        """
+        Сворачивает в листья узлы с наименьшим числом посещений (их поддеревья удаляются, статистика
+        самих узлов остаётся, кроме доказанного исхода), пока в дереве не останется не больше target_nodes узлов.
+        Дети корня не удаляются
+        """
+        if self._nodes_count <= target_nodes:
+            return
+        # раскрытые узлы по убыванию посещений, но только через уже оставленных родителей: с транспозициями
+        # дерево -- граф, и у общего узла посещений может быть больше, чем у любого из родителей.
+        # Каждый узел считается один раз, сколькими бы путями он ни был достижим
+        counted = {id(self.root)} | {id(child) for child in self.root._children.values()}
+        kept_below_root = target_nodes - len(counted)
+        keep_children = set()
+        queued = set()
+        heap = []
+        for child in self.root._children.values():
+            if child._children and id(child) not in queued:
+                queued.add(id(child))
+                heapq.heappush(heap, (-child._visits_number, len(queued), child))
+        while heap:
+            node = heapq.heappop(heap)[2]
+            new_children = [
+                child for child in node._children.values() if id(child) not in counted
+            ]
+            kept_below_root -= len(new_children)
+            if kept_below_root < 0:
+                break
+            keep_children.add(id(node))
+            counted.update(id(child) for child in new_children)
+            for child in node._children.values():
+                if child._children and id(child) not in queued:
+                    queued.add(id(child))
+                    heapq.heappush(heap, (-child._visits_number, len(queued), child))
+
+        stack = list(self.root._children.values())
+        visited = set()
+        while stack:
+            node = stack.pop()
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            if id(node) in keep_children:
+                stack.extend(node._children.values())
+            elif node._children:
+                # свёрнутый в лист узел теряет и доказанный исход: иначе он стал бы доказанным листом без детей
+                node._children = {}
+                node._pending = None
+                node._proven = 0
+        self._forget_unreachable()
+
+    def _forget_unreachable(self) -> None:
+        """
+        Пересчитывает число узлов после move_root или prune и убирает из таблицы транспозиций недостижимые узлы
+        """
+        if self.transpositions is None:
+            self._nodes_count = self._count_nodes()
+            return
+        # граф: узел может быть достижим несколькими путями
+        reachable = {id(self.root)}
+        stack = [self.root]
+        while stack:
+            for child in stack.pop()._children.values():
+                if id(child) not in reachable:
+                    reachable.add(id(child))
+                    stack.append(child)
+        self.transpositions = {
+            key: node
+            for key, node in self.transpositions.items()
+            if id(node) in reachable
+        }
+        self._nodes_count = len(reachable)
+
+    def _count_nodes(self) -> int:
+        count = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node._children.values())
+        return count
+
+    def nodes_count(self) -> int:
+        return self._nodes_count
+
+    def memory_bytes(self) -> int:
+        """
+        Оценка памяти дерева: узлы TreeNode со словарями детей и числами статистики, таблица транспозиций
+        """
+        memory = self._nodes_count * NODE_BYTES
+        if self.transpositions is not None:
+            memory += sys.getsizeof(self.transpositions) + sum(
+                sys.getsizeof(key) for key in self.transpositions
+            )
+        return memory
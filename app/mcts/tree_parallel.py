@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+def run_threaded_playouts(
+    run_playout, board, threads: int, next_playout, tree_lock=None
+) -> None:
+    """
+    Параллельный по дереву поиск: threads потоков делают плейауты run_playout(board_copy)
+    по одному общему дереву, у каждого потока своя копия доски board.
+    Перед каждым плейаутом поток спрашивает next_playout() (вызовы идут по одному под блокировкой):
+    False -- бюджет поиска исчерпан, поток завершается. tree_lock -- блокировка, под которой run_playout
+    меняет дерево: next_playout читает дерево (посещения, число узлов, доказанный исход корня)
+    и вызывается под ней же, чтобы не видеть дерево посреди изменения.
+    Согласованность дерева обеспечивает сам run_playout (блокировка дерева и виртуальные потери).
+    Исключение из любого потока пробрасывается сюда
+    """
+    budget_lock = tree_lock if tree_lock is not None else threading.Lock()
+
+    def worker(thread_board) -> None:
+        while True:
+            with budget_lock:
+                if not next_playout():
+                    return
+            run_playout(thread_board)
+
+    boards = [board.copy() for _ in range(threads)]
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(worker, thread_board) for thread_board in boards]
+        for future in futures:
+            future.result()
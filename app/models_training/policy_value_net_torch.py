@@ -2,8 +2,6 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
-from app.basic_game_core.field import Field
-from app.basic_game_core.node import Node
 import numpy as np
 
 
@@ -119,6 +117,17 @@ class PolicyValueNet:
         if model_file:
             self.policy_value_net.load_state_dict(net_params)
 
+    @classmethod
+    def from_geometry(cls, geometry, model_file=None, use_gpu=False):
+        """network for the board size and number of features of the given Geometry"""
+        return cls(
+            geometry.width,
+            geometry.height,
+            geometry.count_features,
+            model_file=model_file,
+            use_gpu=use_gpu,
+        )
+
     def policy_value(self, state_batch):
         """
         input: a batch of states
@@ -135,17 +144,10 @@ class PolicyValueNet:
             act_probs = np.exp(log_act_probs.data.numpy())
             return act_probs, value.data.numpy()
 
-    def policy_value_function(self, node: Node):
-        available_moves = node.get_available_moves()
-        count_different_figures = 1 << (Field.COUNT_FEATURES - 1)
-        legal_positions = [
-            (move.figure % count_different_figures) * Field.WIDTH * Field.HEIGHT
-            + move.row * Field.WIDTH
-            + move.col
-            for move in available_moves
-        ]
+    def policy_value_function(self, board):
+        legal_positions = np.flatnonzero(board.legal_mask())
         current_state = np.ascontiguousarray(
-            node.current_state().reshape(
+            board.current_state().reshape(
                 -1, 2 * self.count_features + 2, self.board_width, self.board_height
             )
         )
@@ -159,7 +161,9 @@ class PolicyValueNet:
                 torch.tensor(current_state, dtype=torch.float32)
             )
             action_probs = np.exp(log_action_probs.data.numpy().flatten())
-        actions_with_probs = list(zip(available_moves, action_probs[legal_positions]))
+        actions_with_probs = list(
+            zip(legal_positions.tolist(), action_probs[legal_positions])
+        )
         score = score.data[0][0]
 
         return actions_with_probs, score
@@ -5,18 +5,19 @@ from collections import defaultdict, deque
 from ..basic_game_core.game import Game
 from ..mcts.mcts_alphazero import MCTSPlayer as MCTS_alphazero_player
 from ..mcts.mcts import MCTSPlayer as MCTS_pure_player
-from ..basic_game_core.field import Field
+from ..basic_game_core.geometry import Geometry
 from .policy_value_net_torch import PolicyValueNet
 import os
 
 
 class TrainPipeline:
-    def __init__(self, init_model=None):
+    def __init__(self, init_model=None, geometry=None):
         # params of the board and the game
-        self.board_width = Field.WIDTH
-        self.board_height = Field.HEIGHT
-        self.n_in_row = Field.STREAK_TO_WIN
-        self.n_features = Field.COUNT_FEATURES
+        self.geometry = geometry if geometry is not None else Geometry.current()
+        self.board_width = self.geometry.width
+        self.board_height = self.geometry.height
+        self.n_in_row = self.geometry.streak
+        self.n_features = self.geometry.count_features
 
         # training params
         self.learn_rate = 2e-3
@@ -38,17 +39,12 @@ class TrainPipeline:
         self.pure_mcts_playout_num = 1000
         if init_model:
             # start training from an initial policy-value net
-            self.policy_value_net = PolicyValueNet(
-                self.board_width,
-                self.board_height,
-                self.n_features,
-                model_file=init_model,
+            self.policy_value_net = PolicyValueNet.from_geometry(
+                self.geometry, model_file=init_model
             )
         else:
             # start training from a new policy-value net
-            self.policy_value_net = PolicyValueNet(
-                self.board_width, self.board_height, self.n_features
-            )
+            self.policy_value_net = PolicyValueNet.from_geometry(self.geometry)
 
         self.file_name = f"{self.board_width}x{self.board_height}x{self.n_in_row}x{self.n_features}"  # чтобы быстро менять названия
 
@@ -57,28 +53,27 @@ class TrainPipeline:
             self.puct_constant,
             self.playout_number,
             is_selfplay=True,
+            geometry=self.geometry,
         )
-        self.game = Game(self.mcts_player)
+        self.game = Game(self.mcts_player, self.geometry)
 
     def get_equi_data(self, play_data):
         """augment the data set by rotation and flipping
         play_data: [(state, mcts_prob, winner_z), ..., ...]
         """
         extend_data = []
-        d, h, w = self.n_features, self.board_height, self.board_width
-        count_figures = 1 << (d - 1)
+        count_figures = self.geometry.count_different_figures
+        cells_count = self.geometry.cells_count
 
         for state, mcts_prob, winner in play_data:
-            prob_3d = mcts_prob.reshape(count_figures, h, w)
-
-            for k in [1, 2, 3]:
-                equi_state = np.array([np.rot90(s, k) for s in state])
-                equi_prob = np.array([np.rot90(p, k) for p in prob_3d])
-                extend_data.append((equi_state, equi_prob.flatten(), winner))
+            planes = state.reshape(state.shape[0], cells_count)
+            prob_2d = mcts_prob.reshape(count_figures, cells_count)
 
-                equi_state = np.array([np.fliplr(s) for s in equi_state])
-                equi_prob = np.array([np.fliplr(p) for p in equi_prob])
-                extend_data.append((equi_state, equi_prob.flatten(), winner))
+            # symmetry tables are shared by all games of this geometry
+            for permutation in self.geometry.symmetries:
+                equi_state = planes[:, permutation].reshape(state.shape)
+                equi_prob = prob_2d[:, permutation].flatten()
+                extend_data.append((equi_state, equi_prob, winner))
 
         return extend_data
 
@@ -158,9 +153,10 @@ class TrainPipeline:
             self.puct_constant,
             self.playout_number,
             is_selfplay=False,
+            geometry=self.geometry,
         )
         pure_mcts_player = MCTS_pure_player(
-            self.puct_constant, self.pure_mcts_playout_num
+            self.puct_constant, self.pure_mcts_playout_num, self.geometry
         )
         win_cnt = defaultdict(int)
         for i in range(n_games):
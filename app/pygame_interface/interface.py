@@ -181,13 +181,17 @@ class PyGameInterface:
                         if prev_player == Player.Type.CROSS:
                             if self.mcts_vs_dqn_choice == "mcts_x":
                                 self.game.mcts_player.move_and_update(calculated_move)
+                                self.game.mcts_player.start_pondering()
                             else:
                                 self.comp_player.move_and_update(calculated_move)
+                                self.comp_player.start_pondering()
                         elif prev_player == Player.Type.NAUGHT:
                             if self.mcts_vs_dqn_choice == "mcts_x":
                                 self.comp_player.move_and_update(calculated_move)
+                                self.comp_player.start_pondering()
                             else:
                                 self.game.mcts_player.move_and_update(calculated_move)
+                                self.game.mcts_player.start_pondering()
                         self.update_game_state()
                         calculated_move = None
                     calculating_thread = None
@@ -212,6 +216,7 @@ class PyGameInterface:
                     if calculated_move is not None:
                         self.game.make_silent_move(calculated_move)
                         self.game.mcts_player.move_and_update(calculated_move)
+                        self.game.mcts_player.start_pondering()
                         self.update_game_state()
                         self.need_computer_move = False
                         self.update_allowed_click()
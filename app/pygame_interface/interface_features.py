@@ -373,6 +373,15 @@ class PyGameInterfaceFeatures:
                             self.az_player.move_and_update(next_move)
                         if self.pure_mcts_player:
                             self.pure_mcts_player.move_and_update(next_move)
+                        # сходивший игрок обдумывает, пока думает соперник
+                        if (moving_player_type == Player.Type.CROSS) == (
+                            self.mcts_vs_dqn_choice == "mcts_x"
+                        ):
+                            moved_player = self.pure_mcts_player
+                        else:
+                            moved_player = self.az_player
+                        if moved_player:
+                            moved_player.start_pondering()
                         self._update_game_state()
                         next_move = None
                     calc_thread = None
@@ -402,6 +411,7 @@ class PyGameInterfaceFeatures:
                         self.game.make_silent_move(next_move)
                         if self.ai_opponent_for_human:
                             self.ai_opponent_for_human.move_and_update(next_move)
+                            self.ai_opponent_for_human.start_pondering()
                         self._update_game_state()
                         next_move = None
                     calc_thread = None
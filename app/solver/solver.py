@@ -1,5 +1,5 @@
 from app.basic_game_core.field import Field
-from app.basic_game_core.player import Player
+from app.basic_game_core.geometry import Geometry
 from app.basic_game_core.node import Node
 from enum import Enum
 import sys
@@ -14,7 +14,10 @@ class PositionStatus(Enum):
     DRAW_POSITION = 2
 
 
-analyzed_positions: dict[int, tuple[PositionStatus, Field.Cell]] = {}
+# геометрия -> (основной ключ Зобриста -> (проверочный ключ, оценка, лучший ход))
+analyzed_positions: dict[
+    Geometry, dict[int, tuple[int, PositionStatus, Field.Cell]]
+] = {}
 
 
 # @measure_performance
@@ -25,94 +28,60 @@ def get_position_status_and_best_move(
     Возращает оценку позиции и оптимальный ход
     """
 
-    current_position_hash: int = hash(current_state)
-    if current_position_hash in analyzed_positions:
-        return analyzed_positions[current_position_hash]
+    board = current_state.board.copy()
+    positions = analyzed_positions.setdefault(board.geometry, {})
+    return analyze_board(board, positions)
 
-    if current_state.check_win():
-        analyzed_positions[current_position_hash] = (
+
+def analyze_board(board, positions: dict) -> tuple[PositionStatus, Field.Cell]:
+    """
+    Перебор позиций на одной доске (ListBoard или BitBoard) через board.push(move) / board.pop().
+    Позиции кешируются в positions (своём для каждой геометрии) по ключу Зобриста;
+    запись с другим проверочным ключом считается промахом
+    """
+
+    position_key: int = board.zobrist_key
+    verification: int = board.zobrist_verification
+    entry = positions.get(position_key)
+    if entry is not None and entry[0] == verification:
+        return entry[1], entry[2]
+
+    if board.check_win():
+        positions[position_key] = (
+            verification,
             PositionStatus.LOSING_POSITION,
             Field.Cell(),
         )
-        return analyzed_positions[current_position_hash]
+        return PositionStatus.LOSING_POSITION, Field.Cell()
 
-    if not current_state.free_cells_count:
-        analyzed_positions[current_position_hash] = (
+    if not board.free_cells_count:
+        positions[position_key] = (
+            verification,
             PositionStatus.DRAW_POSITION,
             Field.Cell(),
         )
-        return analyzed_positions[current_position_hash]
+        return PositionStatus.DRAW_POSITION, Field.Cell()
 
-    analyzed_positions[current_position_hash] = (
-        PositionStatus.LOSING_POSITION,
-        Field.Cell(),
-    )
+    status, best_move = PositionStatus.LOSING_POSITION, Field.Cell()
+    positions[position_key] = (verification, status, best_move)
     changed: bool = False
-    current_player: Player.Type = current_state.who_moves
-    current_last_move: Field.Cell = current_state.last_move
-    count_different_figures: int = 1 << (Field.COUNT_FEATURES - 1)
-    shift: int = count_different_figures * current_player.value
-
-    current_state.who_moves = Player.Type(abs(current_state.who_moves.value - 1))
-    current_state.free_cells_count -= 1
-
-    for row in range(Field.HEIGHT):
-        for col in range(Field.WIDTH):
-            if current_state.field[row][col] != -1:
-                continue
-
-            for i in range(count_different_figures):
-                figure = i + shift
-                if figure not in current_state.available_figures:
-                    continue
-
-                current_state.field[row][col] = figure
-                if Field.COUNT_FEATURES > 1:
-                    current_state.available_figures.remove(figure)
-                current_state.last_move = Field.Cell(row, col, figure)
-
-                next_position_status: PositionStatus = (
-                    get_position_status_and_best_move(current_state)[0]
-                )
-
-                current_state.field[row][col] = -1
-                current_state.available_figures.add(figure)
-
-                if next_position_status == PositionStatus.LOSING_POSITION:
-                    analyzed_positions[current_position_hash] = (
-                        PositionStatus.WINNING_POSITION,
-                        current_state.last_move,
-                    )
-
-                    current_state.who_moves = current_player
-                    current_state.free_cells_count += 1
-                    current_state.last_move = current_last_move
-
-                    return analyzed_positions[current_position_hash]
-                elif next_position_status == PositionStatus.DRAW_POSITION:
-                    if (
-                        analyzed_positions[current_position_hash][0]
-                        == PositionStatus.LOSING_POSITION
-                    ):
-                        analyzed_positions[current_position_hash] = (
-                            PositionStatus.DRAW_POSITION,
-                            current_state.last_move,
-                        )
-                        changed = True
-                else:
-                    if (
-                        analyzed_positions[current_position_hash][0]
-                        == PositionStatus.LOSING_POSITION
-                        and not changed
-                    ):
-                        analyzed_positions[current_position_hash] = (
-                            PositionStatus.LOSING_POSITION,
-                            current_state.last_move,
-                        )
-                        changed = True
-
-    current_state.who_moves = current_player
-    current_state.free_cells_count += 1
-    current_state.last_move = current_last_move
-
-    return analyzed_positions[current_position_hash]
+
+    for move in board.get_available_moves():
+        board.push(move)
+        next_position_status: PositionStatus = analyze_board(board, positions)[0]
+        board.pop()
+
+        if next_position_status == PositionStatus.LOSING_POSITION:
+            status, best_move = PositionStatus.WINNING_POSITION, move
+            break
+        elif next_position_status == PositionStatus.DRAW_POSITION:
+            if status == PositionStatus.LOSING_POSITION:
+                status, best_move = PositionStatus.DRAW_POSITION, move
+                changed = True
+        else:
+            if status == PositionStatus.LOSING_POSITION and not changed:
+                best_move = move
+                changed = True
+
+    positions[position_key] = (verification, status, best_move)
+    return status, best_move
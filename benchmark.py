@@ -0,0 +1,627 @@
+from app.basic_game_core.field import Field, GameStates
+from app.basic_game_core.board import ListBoard
+from app.basic_game_core.bitboard import BitBoard
+from app.basic_game_core.game import Game
+from app.basic_game_core.geometry import Geometry
+from app.basic_game_core.node import Node, get_game_state
+from app.mcts.mcts import MCTS as PureMCTS, MCTSPlayer as PureMCTSPlayer, policy_value_function
+from app.mcts.mcts_alphazero import MCTS as AlphaZeroMCTS
+from app.mcts.search_tree import TREE_STORAGES
+from app.mcts.tree_node import TreeNode
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# конфигурации (m, n, k, d) из допустимых в стартовом меню: m, n <= 99, k <= max(m, n), 1 <= d <= 10
+BENCHMARK_CONFIGS = [
+    (3, 3, 3, 1),
+    (4, 4, 4, 4),
+    (6, 6, 4, 1),
+    (8, 8, 5, 1),
+    (9, 9, 5, 3),
+    (15, 15, 5, 1),
+    (19, 19, 5, 4),
+    (30, 30, 6, 2),
+    (99, 99, 5, 10),
+]
+
+
+def random_positions(positions_count: int, max_moves: int) -> list[tuple]:
+    """
+    Случайные партии одновременно на ListBoard и BitBoard: [(list_board, bit_board), ...]
+    """
+    count_different_figures = 1 << (Field.COUNT_FEATURES - 1)
+    positions = []
+    while len(positions) < positions_count:
+        list_board, bit_board = ListBoard(), BitBoard()
+        free_cells = [
+            (row, col) for row in range(Field.HEIGHT) for col in range(Field.WIDTH)
+        ]
+        random.shuffle(free_cells)
+        for row, col in free_cells[:max_moves]:
+            shift = count_different_figures * bit_board.who_moves.value
+            available_figures = bit_board.available_figures
+            figures = [
+                figure
+                for figure in range(shift, shift + count_different_figures)
+                if figure in available_figures
+            ]
+            if not figures:
+                break
+            move = Field.Cell(row, col, random.choice(figures))
+            list_board, bit_board = list_board.play(move), bit_board.play(move)
+            positions.append((list_board, bit_board))
+            if bit_board.check_win():
+                break
+    return positions[:positions_count]
+
+
+def measure(function, repeats: int) -> float:
+    """
+    Среднее время одного вызова function в микросекундах
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start_time) / repeats * 1e6
+
+
+def benchmark_win_check(positions_count: int = 200, repeats: int = 20) -> None:
+    """
+    Сравнивает ListBoard.check_win (обход клеток со строками) с BitBoard.check_win (таблицы отрезков).
+    Перед каждым вызовом кеш _win сбрасывается -- иначе повторные вызовы только читают его
+    """
+    print(f"{'config':>14} | {'list, us':>10} | {'bitboard, us':>12} | {'speedup':>7}")
+    for width, height, streak, features in BENCHMARK_CONFIGS:
+        Field.set_dimensions(width, height, streak, features)
+        positions = random_positions(positions_count, width * height)
+
+        for list_board, bit_board in positions:
+            assert list_board.check_win() == bit_board.check_win()
+
+        def run_list():
+            for list_board, _ in positions:
+                list_board._win = None
+                list_board.check_win()
+
+        def run_bitboard():
+            for _, bit_board in positions:
+                bit_board._win = None
+                bit_board.check_win()
+
+        list_time = measure(run_list, repeats) / len(positions)
+        bitboard_time = measure(run_bitboard, repeats) / len(positions)
+        print(
+            f"{f'{width}x{height}x{streak}x{features}':>14} | {list_time:>10.2f} | "
+            f"{bitboard_time:>12.2f} | {list_time / bitboard_time:>6.1f}x"
+        )
+
+
+class CombinedTreeNode(Node):
+    """
+    Узел дерева в прежнем виде: позиция с копией доски и статистика MCTS в одном объекте с __dict__
+    """
+
+    def __init__(self, parent=None, move=None, board=None, prior_probability=1.0):
+        self._parent = parent
+        self.board = board if parent is None else parent.board.play(move)
+        self._children = {}
+        self._visits_number = 0
+        self._estimate_value = 0
+        self._exploration_bonus = 0
+        self._prior_probability = prior_probability
+
+
+def measure_tree_memory(build_tree) -> tuple[int, float]:
+    """
+    Строит дерево функцией build_tree (возвращает число узлов) и считает байты на узел
+    """
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    tree, nodes_count = build_tree()
+    used_memory = tracemalloc.get_traced_memory()[0] - start_memory
+    tracemalloc.stop()
+    del tree
+    return nodes_count, used_memory / nodes_count
+
+
+def benchmark_tree_memory() -> None:
+    """
+    Память на узел дерева поиска глубины 2: прежний узел (доска + статистика) против TreeNode
+    """
+    print(f"{'config':>14} | {'engine':>8} | {'nodes':>7} | {'before, B':>10} | {'TreeNode, B':>11}")
+    for width, height, streak, features in [(6, 6, 4, 1), (9, 9, 5, 1), (8, 8, 5, 2)]:
+        Field.set_dimensions(width, height, streak, features)
+        for engine in (ListBoard, BitBoard):
+            root_board = engine()
+
+            def build_combined_tree():
+                root = CombinedTreeNode(board=root_board)
+                nodes_count = 1
+                for move in root_board.get_available_moves():
+                    child = CombinedTreeNode(root, move)
+                    root._children[move] = child
+                    for child_move in child.board.get_available_moves():
+                        child._children[child_move] = CombinedTreeNode(child, child_move)
+                    nodes_count += 1 + len(child._children)
+                return root, nodes_count
+
+            def build_slots_tree():
+                root = TreeNode()
+                board = root_board.copy()
+                actions = board.legal_actions()
+                root.expand_node((action, 1 / len(actions)) for action in actions)
+                nodes_count = 1 + len(root._children)
+                for action, child in root._children.items():
+                    board.push_action(action)
+                    child_actions = board.legal_actions()
+                    child.expand_node((action, 1 / len(child_actions)) for action in child_actions)
+                    nodes_count += len(child._children)
+                    board.pop()
+                return root, nodes_count
+
+            nodes_count, before = measure_tree_memory(build_combined_tree)
+            _, after = measure_tree_memory(build_slots_tree)
+            print(
+                f"{f'{width}x{height}x{streak}x{features}':>14} | {engine.__name__:>8} | "
+                f"{nodes_count:>7} | {before:>10.0f} | {after:>11.0f}"
+            )
+
+
+def benchmark_batch_random_play(games_count: int = 256) -> None:
+    """
+    Случайные партии: по одной на BitBoard против games_count партий сразу на BatchBoard
+    """
+    print(f"{'config':>14} | {'games':>6} | {'single, games/s':>15} | {'batch, games/s':>14}")
+    for width, height, streak, features in [(3, 3, 3, 1), (4, 4, 4, 4), (8, 8, 5, 1), (15, 15, 5, 1)]:
+        geometry = Geometry.get(height, width, streak, features)
+
+        start_time = time.perf_counter()
+        for _ in range(games_count):
+            board = BitBoard(geometry)
+            while get_game_state(board) == GameStates.CONTINUE and board.legal_moves_count:
+                board.push_action(random.choice(board.legal_actions()))
+        single_speed = games_count / (time.perf_counter() - start_time)
+
+        game = Game(None, geometry)
+        start_time = time.perf_counter()
+        game.start_batch_random_play(games_count, seed=0)
+        batch_speed = games_count / (time.perf_counter() - start_time)
+        print(
+            f"{f'{width}x{height}x{streak}x{features}':>14} | {games_count:>6} | "
+            f"{single_speed:>15.0f} | {batch_speed:>14.0f}"
+        )
+
+
+def uniform_policy_value_function(board):
+    """
+    Равномерные вероятности и нулевая оценка -- вместо сети, чтобы замерять только дерево
+    """
+    actions = board.legal_actions()
+    return [(action, 1 / len(actions)) for action in actions], 0.0
+
+
+def benchmark_tree_storage(playout_number: int = 3000) -> None:
+    """
+    Плейауты в секунду и байты на узел для деревьев TreeNode ("object") и ArrayTree ("array")
+    при одном поиске AlphaZero-MCTS из начальной позиции
+    """
+    print(f"{'config':>14} | {'tree':>6} | {'nodes':>7} | {'playouts/s':>10} | {'B/node':>7}")
+    for width, height, streak, features in [(6, 6, 4, 1), (8, 8, 5, 1), (15, 15, 5, 1), (4, 4, 4, 4)]:
+        geometry = Geometry.get(height, width, streak, features)
+        for storage in TREE_STORAGES:
+            mcts = AlphaZeroMCTS(
+                uniform_policy_value_function, 5, playout_number, geometry, storage
+            )
+            tracemalloc.start()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            start_time = time.perf_counter()
+            for _ in range(playout_number):
+                mcts._run_playout()
+            elapsed_time = time.perf_counter() - start_time
+            used_memory = tracemalloc.get_traced_memory()[0] - start_memory
+            tracemalloc.stop()
+            nodes_count = mcts._tree.nodes_count()
+            print(
+                f"{f'{width}x{height}x{streak}x{features}':>14} | {storage:>6} | {nodes_count:>7} | "
+                f"{playout_number / elapsed_time:>10.0f} | {used_memory / nodes_count:>7.0f}"
+            )
+
+
+def benchmark_rollout(rollouts_count: int = 2000) -> None:
+    """
+    Доигрывания из начальной позиции в секунду: random_rollout на ListBoard и на BitBoard
+    и threat_rollout (с выигрышами и защитой в один ход) на BitBoard
+    """
+    print(
+        f"{'config':>14} | {'list, rollouts/s':>16} | {'bitboard, rollouts/s':>20} | "
+        f"{'threat, rollouts/s':>18}"
+    )
+    for width, height, streak, features in [(3, 3, 3, 1), (4, 4, 4, 4), (8, 8, 5, 1), (15, 15, 5, 1)]:
+        geometry = Geometry.get(height, width, streak, features)
+        speeds = []
+        for engine, rollout in [
+            (ListBoard, "random_rollout"),
+            (BitBoard, "random_rollout"),
+            (BitBoard, "threat_rollout"),
+        ]:
+            run_rollout = getattr(engine(geometry), rollout)
+            start_time = time.perf_counter()
+            for _ in range(rollouts_count):
+                run_rollout()
+            speeds.append(rollouts_count / (time.perf_counter() - start_time))
+        print(
+            f"{f'{width}x{height}x{streak}x{features}':>14} | {speeds[0]:>16.0f} | {speeds[1]:>20.0f} | "
+            f"{speeds[2]:>18.0f}"
+        )
+
+
+def play_match(players: list, geometry: Geometry, games_count: int) -> tuple[list, list[list]]:
+    """
+    games_count партий players[0] против players[1] через Game.start_bot_play, цвета чередуются.
+    Возвращает результаты партий для players[0] (1 -- победа, 0 -- поражение, -1 -- ничья)
+    и по каждому игроку [плейауты, секунды на поиск, ходы]
+    """
+    searches = [[0, 0.0, 0], [0, 0.0, 0]]
+    for player, search in zip(players, searches):
+
+        def counting_get_move(get_move=player.get_move, player=player, search=search):
+            move = get_move()
+            search[0] += player.last_search.playouts
+            search[1] += player.last_search.elapsed_time
+            search[2] += 1
+            return move
+
+        player.get_move = counting_get_move
+
+    game = Game(None, geometry)
+    results = [
+        game.start_bot_play(players[0], players[1], number % 2) for number in range(games_count)
+    ]
+    return results, searches
+
+
+def print_match_header() -> None:
+    print(
+        f"{'config':>14} | {'wins':>4} | {'draws':>5} | {'losses':>6} | {'score':>5} | "
+        f"{'playouts/move':>13} | {'s/move':>6} | {'opponent playouts/move':>22} | {'s/move':>6}"
+    )
+
+
+def print_match(geometry: Geometry, results: list, searches: list[list]) -> None:
+    """
+    Строка итогов play_match: счёт первого игрока (ничья -- пол-очка), плейауты и время поиска на ход обоих
+    """
+    wins, draws = results.count(1), results.count(-1)
+    losses = len(results) - wins - draws
+    config = f"{geometry.width}x{geometry.height}x{geometry.streak}x{geometry.count_features}"
+    print(
+        f"{config:>14} | {wins:>4} | {draws:>5} | {losses:>6} | "
+        f"{(wins + draws / 2) / len(results):>5.2f} | "
+        f"{searches[0][0] / searches[0][2]:>13.0f} | {searches[0][1] / searches[0][2]:>6.3f} | "
+        f"{searches[1][0] / searches[1][2]:>22.0f} | {searches[1][1] / searches[1][2]:>6.3f}"
+    )
+
+
+def benchmark_rollout_policy(time_budget: float = 0.1, games_count: int = 10) -> None:
+    """
+    Сила на секунду процессора: чистый MCTS с доигрыванием "threat" против "random" при одинаковом
+    времени на ход time_budget, games_count партий (см. play_match); счёт -- с точки зрения "threat"
+    """
+    print(f"threat vs random rollouts, budget {time_budget} s per move, {games_count} games")
+    print_match_header()
+    for width, height, streak, features in [(6, 6, 4, 1), (8, 8, 5, 1), (4, 4, 4, 4)]:
+        geometry = Geometry.get(height, width, streak, features)
+        players = [
+            PureMCTSPlayer(5, 10**9, geometry, time_budget=time_budget, rollout_policy=policy)
+            for policy in ("threat", "random")
+        ]
+        print_match(geometry, *play_match(players, geometry, games_count))
+
+
+def benchmark_rave(playout_number: int = 1000, games_count: int = 10) -> None:
+    """
+    Сила при равном числе плейаутов: чистый MCTS с RAVE против обычного UCT, playout_number плейаутов
+    на ход (без ранней остановки), games_count партий (см. play_match); счёт -- с точки зрения RAVE
+    """
+    print(f"RAVE vs UCT, {playout_number} playouts per move, {games_count} games")
+    print_match_header()
+    for width, height, streak, features in [(6, 6, 4, 1), (8, 8, 5, 1), (15, 15, 5, 1)]:
+        geometry = Geometry.get(height, width, streak, features)
+        players = [
+            PureMCTSPlayer(5, playout_number, geometry, early_stop=False, rave=rave)
+            for rave in (True, False)
+        ]
+        print_match(geometry, *play_match(players, geometry, games_count))
+
+
+def benchmark_widening(time_budget: float = 0.4, games_count: int = 10) -> None:
+    """
+    Сила на поле 15x15x5 при равном времени на ход time_budget: чистый MCTS с раскрытием только ходов рядом
+    с занятыми клетками (candidate_radius) и/или прогрессивным расширением (widening) против раскрытия всех ходов;
+    games_count партий (см. play_match), счёт -- с точки зрения первого
+    """
+    geometry = Geometry.get(15, 15, 5, 1)
+    print(f"restricted vs all moves, budget {time_budget} s per move, {games_count} games")
+    for candidate_radius, widening in [(1, 0), (0, 2.0), (1, 2.0)]:
+        print(f"candidate_radius {candidate_radius}, widening {widening}")
+        print_match_header()
+        players = [
+            PureMCTSPlayer(
+                5,
+                10**9,
+                geometry,
+                time_budget=time_budget,
+                candidate_radius=candidate_radius,
+                widening=widening,
+            ),
+            PureMCTSPlayer(5, 10**9, geometry, time_budget=time_budget),
+        ]
+        print_match(geometry, *play_match(players, geometry, games_count))
+
+
+def benchmark_root_parallel(playouts_per_worker: int = 2000) -> None:
+    """
+    Плейауты в секунду параллельного по корню чистого MCTS для 1, 2, 4, ... процессов (до числа ядер)
+    """
+    geometry = Geometry.get(8, 8, 5, 1)
+    workers_counts = [1]
+    while workers_counts[-1] * 2 <= (os.cpu_count() or 1):
+        workers_counts.append(workers_counts[-1] * 2)
+
+    print(f"8x8x5x1, {playouts_per_worker} playouts per worker, {os.cpu_count()} cpu")
+    print(f"{'workers':>7} | {'playouts/s':>10} | {'scaling':>7}")
+    base_speed = None
+    for workers in workers_counts:
+        mcts = PureMCTS(
+            policy_value_function,
+            5,
+            playouts_per_worker * workers,
+            geometry,
+            workers=workers,
+            playouts_per_worker=playouts_per_worker,
+        )
+        if workers > 1:
+            mcts.get_move()  # прогрев: запуск процессов пула
+        start_time = time.perf_counter()
+        mcts.get_move()
+        speed = playouts_per_worker * workers / (time.perf_counter() - start_time)
+        base_speed = base_speed or speed
+        print(f"{workers:>7} | {speed:>10.0f} | {speed / base_speed:>6.1f}x")
+
+
+def benchmark_tree_parallel(playout_number: int = 2000) -> None:
+    """
+    Параллельный по дереву поиск: плейауты в секунду для 1, 2, 4 потоков у обоих MCTS на обоих деревьях.
+    Интервал переключения потоков уменьшен, чтобы потоки чаще перемежались.
+    Согласованность дерева после такого поиска проверяет python -m check tree_parallel
+    """
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    print(f"{'config':>14} | {'mcts':>9} | {'tree':>6} | {'threads':>7} | {'playouts/s':>10}")
+    try:
+        for width, height, streak, features in [(3, 3, 3, 1), (4, 4, 4, 4), (8, 8, 5, 1)]:
+            geometry = Geometry.get(height, width, streak, features)
+            for name, mcts_class, function in [
+                ("pure", PureMCTS, policy_value_function),
+                ("alphazero", AlphaZeroMCTS, uniform_policy_value_function),
+            ]:
+                for storage in TREE_STORAGES:
+                    for threads in (1, 2, 4):
+                        # все playout_number плейаутов: без ранней остановки и остановки по доказанному корню
+                        mcts = mcts_class(
+                            function,
+                            5,
+                            playout_number,
+                            geometry,
+                            storage,
+                            threads=threads,
+                            early_stop=False,
+                            solver=False,
+                        )
+                        start_time = time.perf_counter()
+                        mcts._run_playouts()
+                        elapsed_time = time.perf_counter() - start_time
+                        print(
+                            f"{f'{width}x{height}x{streak}x{features}':>14} | {name:>9} | {storage:>6} | "
+                            f"{threads:>7} | {mcts.last_search.playouts / elapsed_time:>10.0f}"
+                        )
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def benchmark_time_budget(time_budget: float = 0.2, moves_count: int = 5) -> None:
+    """
+    Задержка хода при поиске с пределом time_budget секунд: среднее и наибольшее время get_move
+    и среднее число плейаутов за ход на первых moves_count ходах партии
+    """
+    print(f"budget {time_budget} s, {moves_count} moves")
+    print(f"{'config':>14} | {'mcts':>9} | {'mean, s':>7} | {'max, s':>7} | {'playouts/move':>13}")
+    for width, height, streak, features in [(3, 3, 3, 1), (8, 8, 5, 1), (15, 15, 5, 1), (4, 4, 4, 4)]:
+        geometry = Geometry.get(height, width, streak, features)
+        for name, mcts_class, function in [
+            ("pure", PureMCTS, policy_value_function),
+            ("alphazero", AlphaZeroMCTS, uniform_policy_value_function),
+        ]:
+            mcts = mcts_class(function, 5, 10**9, geometry, time_budget=time_budget)
+            board = BitBoard(geometry)
+            latencies, playouts = [], 0
+            for _ in range(moves_count):
+                if get_game_state(board) != GameStates.CONTINUE or not board.legal_moves_count:
+                    break
+                start_time = time.perf_counter()
+                mcts._run_playouts()
+                latencies.append(time.perf_counter() - start_time)
+                playouts += mcts.last_search.playouts
+                move = geometry.decode_action(
+                    max(
+                        mcts._tree.children(mcts._tree.root),
+                        key=lambda child: mcts._tree.visit_count(child[1]),
+                    )[0],
+                    board.who_moves,
+                )
+                mcts.move_and_update(move)
+                board.push(move)
+            print(
+                f"{f'{width}x{height}x{streak}x{features}':>14} | {name:>9} | "
+                f"{sum(latencies) / len(latencies):>7.3f} | {max(latencies):>7.3f} | "
+                f"{playouts / len(latencies):>13.0f}"
+            )
+
+
+def benchmark_ponder(time_budget: float = 0.2, moves_count: int = 6) -> None:
+    """
+    Обдумывание на времени соперника: соперник думает time_budget секунд (sleep) и делает ожидаемый
+    ход -- самый посещённый в дереве MCTS (если корень не раскрыт -- случайный), MCTS ищет time_budget секунд на ход. Сравниваются посещения
+    корня к концу поиска (плейауты, на которых основан выбор хода), задержка хода и плейауты обдумывания
+    на ход без обдумывания и с ним. Выигрыш тем больше, чем больше обдумывания приходится на ход соперника
+    """
+    print(f"budget {time_budget} s, {moves_count} moves")
+    print(
+        f"{'config':>14} | {'mcts':>9} | {'ponder':>6} | {'root visits':>11} | "
+        f"{'latency, s':>10} | {'pondered':>8}"
+    )
+    for width, height, streak, features in [(8, 8, 5, 1), (15, 15, 5, 1)]:
+        geometry = Geometry.get(height, width, streak, features)
+        for name, mcts_class, function in [
+            ("pure", PureMCTS, policy_value_function),
+            ("alphazero", AlphaZeroMCTS, uniform_policy_value_function),
+        ]:
+            for ponder in (False, True):
+                mcts = mcts_class(
+                    function, 5, 10**9, geometry, time_budget=time_budget, ponder=ponder
+                )
+                board = BitBoard(geometry)
+                root_visits, latencies, pondered = [], [], 0
+                random.seed(0)
+                for _ in range(moves_count):
+                    start_time = time.perf_counter()
+                    mcts._run_playouts()
+                    latencies.append(time.perf_counter() - start_time)
+                    root_visits.append(mcts._tree.visit_count(mcts._tree.root))
+                    for opponent in (False, True):
+                        if opponent:
+                            # соперник думает time_budget секунд, пока MCTS обдумывает
+                            mcts.start_pondering()
+                            time.sleep(time_budget)
+                            mcts.stop_pondering()
+                            pondered += mcts.last_ponder.playouts if ponder else 0
+                        children = mcts._tree.children(mcts._tree.root)
+                        if children:
+                            action = max(
+                                children, key=lambda child: mcts._tree.visit_count(child[1])
+                            )[0]
+                            move = geometry.decode_action(action, board.who_moves)
+                        else:
+                            move = random.choice(board.get_available_moves())
+                        mcts.move_and_update(move)
+                        board.push(move)
+                    if get_game_state(board) != GameStates.CONTINUE:
+                        break
+                mcts.stop_pondering()
+                print(
+                    f"{f'{width}x{height}x{streak}x{features}':>14} | {name:>9} | {str(ponder):>6} | "
+                    f"{sum(root_visits) / len(root_visits):>11.0f} | "
+                    f"{sum(latencies) / len(latencies):>10.3f} | {pondered / len(latencies):>8.0f}"
+                )
+
+
+def benchmark_transpositions(playout_number: int = 3000) -> None:
+    """
+    Поиск с таблицей транспозиций и без неё: сколько раз оценивались листья (вызовы сети у AlphaZero,
+    раскрытия перед доигрыванием у чистого MCTS), сколько из них -- повторные оценки уже встречавшихся
+    позиций, узлы дерева и плейауты в секунду
+    """
+    print(
+        f"{'config':>14} | {'mcts':>9} | {'table':>5} | {'evals':>6} | {'repeated':>8} | "
+        f"{'nodes':>7} | {'playouts/s':>10}"
+    )
+    for width, height, streak, features in [(3, 3, 3, 1), (4, 4, 3, 1), (6, 6, 4, 1), (4, 4, 4, 4)]:
+        geometry = Geometry.get(height, width, streak, features)
+        for name, mcts_class, function in [
+            ("pure", PureMCTS, policy_value_function),
+            ("alphazero", AlphaZeroMCTS, uniform_policy_value_function),
+        ]:
+            for transpositions in (False, True):
+                evaluated = []
+
+                def counting_function(board):
+                    evaluated.append(board.zobrist)
+                    return function(board)
+
+                mcts = mcts_class(
+                    counting_function,
+                    5,
+                    playout_number,
+                    geometry,
+                    transpositions=transpositions,
+                )
+                start_time = time.perf_counter()
+                mcts._run_playouts()
+                elapsed_time = time.perf_counter() - start_time
+                repeated = len(evaluated) - len(set(evaluated))
+                print(
+                    f"{f'{width}x{height}x{streak}x{features}':>14} | {name:>9} | {str(transpositions):>5} | "
+                    f"{len(evaluated):>6} | {repeated / len(evaluated):>7.1%} | "
+                    f"{mcts._tree.nodes_count():>7} | {playout_number / elapsed_time:>10.0f}"
+                )
+
+
+def benchmark_tree_limit(
+    playout_number: int = 10000, max_tree_nodes: int = 200000, moves_count: int = 4
+) -> None:
+    """
+    Чистый MCTS на 15x15x5 с потолком узлов дерева max_tree_nodes и без него: после каждого хода --
+    узлы, память дерева, число сокращений и плейауты в секунду
+    """
+    geometry = Geometry.get(15, 15, 5, 1)
+    print(f"15x15x5x1, {playout_number} playouts per move")
+    print(f"{'tree':>6} | {'limit':>7} | {'move':>4} | {'nodes':>7} | {'MiB':>6} | {'prunes':>6} | {'playouts/s':>10}")
+    for storage in TREE_STORAGES:
+        for limit in (0, max_tree_nodes):
+            mcts = PureMCTS(
+                policy_value_function, 5, playout_number, geometry, storage, max_tree_nodes=limit
+            )
+            for move_number in range(moves_count):
+                move = mcts.get_move()
+                search = mcts.last_search
+                mcts.move_and_update(move)
+                print(
+                    f"{storage:>6} | {limit:>7} | {move_number:>4} | {search.nodes_count:>7} | "
+                    f"{search.memory_bytes / 2**20:>6.1f} | {search.prunes:>6} | "
+                    f"{search.playouts / search.elapsed_time:>10.0f}"
+                )
+
+
+BENCHMARKS = {
+    "win_check": benchmark_win_check,
+    "tree_memory": benchmark_tree_memory,
+    "batch_random_play": benchmark_batch_random_play,
+    "tree_storage": benchmark_tree_storage,
+    "rollout": benchmark_rollout,
+    "rollout_policy": benchmark_rollout_policy,
+    "rave": benchmark_rave,
+    "widening": benchmark_widening,
+    "root_parallel": benchmark_root_parallel,
+    "tree_parallel": benchmark_tree_parallel,
+    "time_budget": benchmark_time_budget,
+    "ponder": benchmark_ponder,
+    "transpositions": benchmark_transpositions,
+    "tree_limit": benchmark_tree_limit,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности движка")
+    parser.add_argument("name", choices=list(BENCHMARKS))
+    args = parser.parse_args()
+
+    random.seed(0)
+    BENCHMARKS[args.name]()
+
+
+if __name__ == "__main__":
+    main()
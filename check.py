@@ -0,0 +1,126 @@
+from app.basic_game_core.geometry import Geometry
+from app.mcts.mcts import MCTS as PureMCTS, policy_value_function
+from app.mcts.candidates import widening_limit
+from app.mcts.mcts_alphazero import MCTS as AlphaZeroMCTS
+from app.mcts.search_tree import TREE_STORAGES
+from benchmark import uniform_policy_value_function
+import argparse
+import random
+import sys
+
+
+def check_tree_consistency(tree, playout_number: int) -> None:
+    """
+    Проверка статистики дерева после поиска из нового корня: корень посещён playout_number раз,
+    у раскрытого узла посещений больше суммы посещений детей, оценки в [-1, 1], виртуальных потерь не осталось
+    """
+    assert tree.visit_count(tree.root) == playout_number, tree.visit_count(tree.root)
+    assert tree.virtual_loss_paths == 0
+    stack = [tree.root]
+    while stack:
+        node = stack.pop()
+        children = [child for _, child in tree.children(node)]
+        children_visits = sum(tree.visit_count(child) for child in children)
+        assert tree.visit_count(node) >= children_visits + (1 if children else 0)
+        assert -1 - 1e-9 <= tree.value(node) <= 1 + 1e-9
+        assert tree.pending_virtual_loss(node) == 0
+        stack.extend(children)
+
+
+def check_tree_parallel(playout_number: int = 2000) -> None:
+    """
+    Согласованность дерева после параллельного по дереву поиска (check_tree_consistency): 1, 2, 4 потока
+    у обоих MCTS на обоих деревьях. Ранняя остановка и MCTS-Solver выключены -- поиск делает все
+    playout_number плейаутов. Интервал переключения потоков уменьшен, чтобы потоки чаще перемежались
+    """
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        for width, height, streak, features in [(3, 3, 3, 1), (4, 4, 4, 4), (8, 8, 5, 1)]:
+            geometry = Geometry.get(height, width, streak, features)
+            for name, mcts_class, function in [
+                ("pure", PureMCTS, policy_value_function),
+                ("alphazero", AlphaZeroMCTS, uniform_policy_value_function),
+            ]:
+                for storage in TREE_STORAGES:
+                    for threads in (1, 2, 4):
+                        mcts = mcts_class(
+                            function,
+                            5,
+                            playout_number,
+                            geometry,
+                            storage,
+                            threads=threads,
+                            early_stop=False,
+                            solver=False,
+                        )
+                        mcts._run_playouts()
+                        assert mcts.last_search.playouts == playout_number, mcts.last_search
+                        check_tree_consistency(mcts._tree, playout_number)
+                        print(
+                            f"{f'{width}x{height}x{streak}x{features}':>14} | {name:>9} | {storage:>6} | "
+                            f"{threads} threads | ok"
+                        )
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def check_widening(playout_number: int = 1500, widening: float = 2.0) -> None:
+    """
+    Прогрессивное расширение добавляет детей по мере посещений: у каждого узла после поиска
+    не больше widening_limit(N) детей, и nodes_count -- число узлов, достижимых из корня
+    (ещё не добавленные ходы узлами не считаются). Оба MCTS на обоих деревьях, 1 и 4 потока, с MCTS-Solver
+    """
+    geometry = Geometry.get(9, 9, 5, 1)
+    for name, mcts_class, function in [
+        ("pure", PureMCTS, policy_value_function),
+        ("alphazero", AlphaZeroMCTS, uniform_policy_value_function),
+    ]:
+        for storage in TREE_STORAGES:
+            for threads in (1, 4):
+                mcts = mcts_class(
+                    function,
+                    5,
+                    playout_number,
+                    geometry,
+                    storage,
+                    threads=threads,
+                    early_stop=False,
+                    solver=True,
+                    widening=widening,
+                )
+                mcts._run_playouts()
+                tree = mcts._tree
+                nodes = 0
+                stack = [tree.root]
+                while stack:
+                    node = stack.pop()
+                    nodes += 1
+                    children = [child for _, child in tree.children(node)]
+                    limit = widening_limit(tree.visit_count(node), widening, 0.5)
+                    assert len(children) <= limit, (len(children), limit)
+                    stack.extend(children)
+                assert nodes == tree.nodes_count(), (nodes, tree.nodes_count())
+                print(f"{name:>9} | {storage:>6} | {threads} threads | {nodes} nodes | ok")
+
+
+CHECKS = {
+    "tree_parallel": check_tree_parallel,
+    "widening": check_widening,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Проверки согласованности поиска; при ошибке -- AssertionError и ненулевой код выхода"
+    )
+    parser.add_argument("name", nargs="?", choices=list(CHECKS), help="по умолчанию -- все проверки")
+    args = parser.parse_args()
+
+    random.seed(0)
+    for name in [args.name] if args.name else CHECKS:
+        CHECKS[name]()
+
+
+if __name__ == "__main__":
+    main()
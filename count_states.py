@@ -1,6 +1,5 @@
 from app.basic_game_core.field import Field
 from app.basic_game_core.node import Node
-from app.basic_game_core.player import Player
 from app.basic_game_core.config.game_config import MAX_FIELD_SIZE_FOR_SOLVER
 from tqdm import tqdm
 from typing import Set
@@ -25,17 +24,17 @@ def count_states_dfs() -> int:
     Считает число уникальных состояний в дереве игры с помощью dfs
     """
 
-    visited: Set[int] = set()  # хеши уже посещенных состояний
+    visited: Set[int] = set()  # 128-битные ключи Зобриста уже посещенных состояний
 
     pbar = tqdm(desc="DFS progress", unit="states")  # прогресс бар
 
-    def dfs(current_state: Node) -> int:
+    def dfs(current_state) -> int:
         """
         Рекурсивная функция для обхода дерева игры.
         Возвращает количество уникальных состояний в поддереве.
         """
 
-        state_hash = hash(current_state)
+        state_hash = current_state.zobrist
 
         if state_hash in visited:
             return 0
@@ -50,151 +49,23 @@ def count_states_dfs() -> int:
 
         total_states = 1  # текущее состояние
 
-        # сохраняем то, что было тут
-        current_player = current_state.who_moves
-        current_last_move = current_state.last_move
-        current_free_cells = current_state.free_cells_count
-
-        # меняем игрока
-        current_state.who_moves = Player.Type(abs(current_state.who_moves.value - 1))
-        current_state.free_cells_count -= 1
-
-        for row in range(Field.HEIGHT):
-            for col in range(Field.WIDTH):
-                if current_state.field[row][col] != Player.Type.NONE:
-                    continue
-
-                # новый ход
-                current_state.field[row][col] = current_player
-                current_state.last_move = Field.Cell(row, col)
-
-                # рекурсивно идем дальше
-                total_states += dfs(current_state)
-
-                # откат
-                current_state.field[row][col] = Player.Type.NONE
-
-        # еще откат
-        current_state.who_moves = current_player
-        current_state.last_move = current_last_move
-        current_state.free_cells_count = current_free_cells
+        for move in current_state.get_available_moves():
+            # рекурсивно идем дальше и откатываем ход
+            current_state.push(move)
+            total_states += dfs(current_state)
+            current_state.pop()
 
         return total_states
 
     try:
         initial_state = Node()
 
-        return dfs(initial_state)
+        return dfs(initial_state.board)
 
     finally:
         pbar.close()
 
 
-def check_winning_line_through_move(
-    field: Field, last_move: Field.Cell, streak_to_win: int
-) -> bool:
-    """
-    Проверка: завершилась ли победой игра после крайнего хода
-    """
-    row, col = last_move.row, last_move.col
-    player = field[row][col]
-
-    height, width = len(field), len(field[0])
-
-    """
-    горизонт
-    """
-    count = 1
-    # влево
-    for c in range(col - 1, -1, -1):
-        if field[row][c] == player:
-            count += 1
-        else:
-            break
-    # вправо
-    for c in range(col + 1, width):
-        if field[row][c] == player:
-            count += 1
-        else:
-            break
-    if count >= streak_to_win:
-        return True
-
-    """
-    вертикаль
-    """
-    count = 1
-    # вверх
-    for r in range(row - 1, -1, -1):
-        if field[r][col] == player:
-            count += 1
-        else:
-            break
-    # вниз
-    for r in range(row + 1, height):
-        if field[r][col] == player:
-            count += 1
-        else:
-            break
-    if count >= streak_to_win:
-        return True
-
-    """
-    диагональ \\
-    """
-    count = 1
-    # влево вверх
-    r, c = row - 1, col - 1
-    while r >= 0 and c >= 0:
-        if field[r][c] == player:
-            count += 1
-            r -= 1
-            c -= 1
-        else:
-            break
-    # вправо вниз
-    r, c = row + 1, col + 1
-    while r < height and c < width:
-        if field[r][c] == player:
-            count += 1
-            r += 1
-            c += 1
-        else:
-            break
-    if count >= streak_to_win:
-        return True
-
-    """
-    диагональ /
-    """
-    count = 1
-    # вправо вверх
-    r, c = row - 1, col + 1
-    while r >= 0 and c < width:
-        if field[r][c] == player:
-            count += 1
-            r -= 1
-            c += 1
-        else:
-            break
-    # влево вниз
-    r, c = row + 1, col - 1
-    while r < height and c >= 0:
-        if field[r][c] == player:
-            count += 1
-            r += 1
-            c -= 1
-        else:
-            break
-    if count >= streak_to_win:
-        return True
-
-    """
-    жизнь боль, везде облом
-    """
-    return False
-
-
 def main():
     width = int(input("m >  "))
     height = int(input("n >  "))
@@ -203,7 +74,7 @@ def main():
         input("simulations power factor (0 < float <= 1) >  ")
     )  # степень для расчета количества симуляций
 
-    Field.set_dimensions(width, height, streak)
+    Field.set_dimensions(width, height, streak, 1)
 
     total_cells = width * height
 
@@ -222,47 +93,33 @@ def main():
 
         # случайно делаем simulations_count раз move ходов
         for _ in range(simulations_count):
-            cur_node = Node()
-            cur_player = Player.Type.CROSS
+            board = Node().board
             game_ended = False
             is_terminal_on_last_move = False
 
             for move_num in range(move):
-                next_move = random.choice(cur_node.get_available_moves())
-                cur_node.field[next_move.row][next_move.col] = cur_player
+                next_move = random.choice(board.get_available_moves())
+                board.push(next_move)
 
                 # проверяем окончание игры только на последнем ходу, чтобы считать is_good и терминальные состояния на нем
                 if move_num == move - 1:
                     # если победа на последнем ходу или ничья (все клетки заполнены) - считаем состояние хорошим
-                    if (
-                        check_winning_line_through_move(
-                            cur_node.field, next_move, streak
-                        )
-                        or move == total_cells
-                    ):
+                    if board.check_win() or move == total_cells:
                         is_terminal_on_last_move = True
                 else:  # если не последний ход
                     # если игра закончилась раньше - считаем состояние плохим
-                    if check_winning_line_through_move(
-                        cur_node.field, next_move, streak
-                    ):
+                    if board.check_win():
                         game_ended = True
 
                         break
 
-                cur_player = (
-                    Player.Type.NAUGHT
-                    if cur_player == Player.Type.CROSS
-                    else Player.Type.CROSS
-                )
-
             # состояние хорошее если игра не закончилась раньше времени ИЛИ закончилась на последнем ходу
-            if hash(cur_node) not in visited_nodes_hashes and (
+            if board.zobrist not in visited_nodes_hashes and (
                 not game_ended or is_terminal_on_last_move
             ):
                 is_good += 1
 
-            visited_nodes_hashes.add(hash(cur_node))
+            visited_nodes_hashes.add(board.zobrist)
 
         possible_states = math.comb(total_cells, move) * (2 ** (move - 1))
 